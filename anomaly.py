@@ -0,0 +1,64 @@
+"""Streaming anomaly detection for monitoring samples.
+
+Each (device, metric) pair keeps an exponentially weighted mean and variance
+(three floats), updated in O(1) as samples arrive. A sample whose z-score
+against that baseline exceeds the threshold is flagged, e.g.
+'response_time_anomaly', so gradual drifts and sudden shifts show up long
+before a static threshold is crossed.
+"""
+import math
+
+# Metrics scored per sample, with the smallest standard deviation assumed
+# for each so a perfectly steady device does not flag on tiny wobbles
+ANOMALY_METRICS = {
+    'response_time': 0.001,  # seconds
+    'jitter': 0.001,         # seconds
+    'packet_loss': 5.0,      # percent
+}
+
+class EwmaDetector:
+    def __init__(self, alpha=0.1, threshold=4.0, warmup=30):
+        self.alpha = alpha
+        self.threshold = threshold
+        # Samples needed before a baseline is trusted
+        self.warmup = warmup
+        # (device_id, metric) -> [mean, variance, samples seen]
+        self._state = {}
+        self._devices = set()
+
+    def knows(self, device_id):
+        return device_id in self._devices
+
+    def update(self, device_id, sample, score=True):
+        """Fold a sample into the baselines and return the anomaly flags"""
+        self._devices.add(device_id)
+        flags = []
+        for metric, min_std in ANOMALY_METRICS.items():
+            value = sample.get(metric)
+            # RTT and jitter are -1 when the device did not answer
+            if value is None or value < 0:
+                continue
+            key = (device_id, metric)
+            state = self._state.get(key)
+            if state is None:
+                self._state[key] = [float(value), 0.0, 1]
+                continue
+
+            mean, variance, seen = state
+            if score and seen >= self.warmup:
+                z = (value - mean) / max(math.sqrt(variance), min_std)
+                if abs(z) > self.threshold:
+                    flags.append(f'{metric}_anomaly')
+
+            # Incremental EWMA mean/variance (West, 1979)
+            diff = value - mean
+            increment = self.alpha * diff
+            state[0] = mean + increment
+            state[1] = (1 - self.alpha) * (variance + diff * increment)
+            state[2] = seen + 1
+        return flags
+
+    def forget(self, device_id):
+        self._devices.discard(device_id)
+        for metric in ANOMALY_METRICS:
+            self._state.pop((device_id, metric), None)
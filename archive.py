@@ -0,0 +1,242 @@
+"""Compressed cold archive for aged monitoring history.
+
+The Archiver moves whole UTC days of monitoring_history older than a
+configurable age out of SQLite into one file per day:
+
+    <archive_dir>/<YYYY-MM-DD>.<run>.nma.gz   (.nma.zst with zstandard installed)
+
+A day file is a concatenation of independently compressed blocks, one per
+device. The archive_blocks table records each block's offset and length, so
+reading one device's day is a seek plus one decompression. Inside a block
+the timestamps (microseconds) are delta-of-delta encoded, which turns a
+steady probe cadence into a run of near-zero values, and every float column
+is byte-shuffled so the compressor sees the slowly changing sign/exponent
+bytes together. Threshold violations are kept as the segment store's bitmask.
+
+Hourly rollups and the state-transition log are left in SQLite, so trends,
+percentiles and availability never touch the archive; get_device_history
+(and the exports built on it) and get_device_columns fall back to it when
+the hot table runs out.
+"""
+import gzip
+import logging
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from instrumentation import REGISTRY
+from segment_store import METRIC_COLUMNS, decode_flags
+
+try:
+    import zstandard
+except ImportError:  # Optional, gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_DAYS = 30
+DAY_FORMAT = '%Y-%m-%d'
+
+ARCHIVED_ROWS = REGISTRY.counter('network_monitor_archived_rows', 'History rows moved to the cold archive')
+ARCHIVE_SECONDS = REGISTRY.histogram('network_monitor_archive_seconds', 'Time to archive one day of history')
+
+_BLOCK_HEADER = struct.Struct('<4sII')
+_BLOCK_MAGIC = b'NMA1'
+_EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is needed to read this archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def _shuffle(values):
+    # Group byte 0 of every value, then byte 1, ...
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+def _unshuffle(data, dtype, count):
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, count).T.copy().view(dtype).ravel()
+
+def to_micros(timestamp):
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+def from_micros(micros):
+    return _EPOCH + timedelta(microseconds=int(micros))
+
+def encode_block(device_id, columns):
+    """Serialize one device's samples; columns['ts'] is int64 microseconds, ascending"""
+    ts = np.asarray(columns['ts'], dtype='<i8')
+    count = len(ts)
+    deltas = np.diff(ts, prepend=np.int64(0))
+    parts = [_BLOCK_HEADER.pack(_BLOCK_MAGIC, int(device_id), count),
+             _shuffle(np.diff(deltas, prepend=np.int64(0)))]
+    for name in METRIC_COLUMNS:
+        parts.append(_shuffle(np.asarray(columns[name], dtype='<f8')))
+    parts.append(np.asarray(columns['status'], dtype='u1').tobytes())
+    parts.append(_shuffle(np.asarray(columns['flags'], dtype='<u2')))
+    return b''.join(parts)
+
+def decode_block(data):
+    magic, device_id, count = _BLOCK_HEADER.unpack_from(data)
+    if magic != _BLOCK_MAGIC:
+        raise ValueError("Not an archive block")
+    offset = _BLOCK_HEADER.size
+    f8, u2 = np.dtype('<f8'), np.dtype('<u2')
+
+    def take(dtype):
+        nonlocal offset
+        size = dtype.itemsize * count
+        chunk = data[offset:offset + size]
+        offset += size
+        return chunk
+
+    columns = {'ts': np.cumsum(np.cumsum(_unshuffle(take(np.dtype('<i8')), np.dtype('<i8'), count)))}
+    for name in METRIC_COLUMNS:
+        columns[name] = _unshuffle(take(f8), f8, count)
+    columns['status'] = np.frombuffer(take(np.dtype('u1')), dtype='u1')
+    columns['flags'] = _unshuffle(take(u2), u2, count)
+    return device_id, columns
+
+def read_block(path, offset, length, codec):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return decode_block(_decompress(data, codec))[1]
+
+def block_records(device_id, columns, newest_first=True):
+    """Expand a decoded block into get_device_history records"""
+    order = range(len(columns['ts']) - 1, -1, -1) if newest_first else range(len(columns['ts']))
+    lists = {name: values.tolist() for name, values in columns.items()}
+    records = []
+    for i in order:
+        record = {
+            'device_id': int(device_id),
+            'timestamp': from_micros(lists['ts'][i]),
+            'status': bool(lists['status'][i]),
+            'threshold_violations': decode_flags(lists['flags'][i]),
+        }
+        for name in METRIC_COLUMNS:
+            record[name] = lists[name][i]
+        records.append(record)
+    return records
+
+def merge_columns(previous, columns):
+    """Combine a decoded block with newly read rows, ordered by time"""
+    merged = {name: np.concatenate([values, np.asarray(columns[name], dtype=values.dtype)])
+              for name, values in previous.items()}
+    order = np.argsort(merged['ts'], kind='stable')
+    return {name: values[order] for name, values in merged.items()}
+
+def write_day_file(path, blocks, codec):
+    """Write [(device_id, columns)] as one day file, atomically.
+
+    Returns (device_id, offset, length, sample_count, first_ts, last_ts)
+    per block, timestamps in microseconds.
+    """
+    index = []
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for device_id, columns in blocks:
+            data = _compress(encode_block(device_id, columns), codec)
+            offset = f.tell()
+            f.write(data)
+            ts = columns['ts']
+            index.append((device_id, offset, len(data), len(ts), int(ts[0]), int(ts[-1])))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return index
+
+def day_file_path(archive_dir, day, codec):
+    # A fresh name per run so a re-archived day never overwrites a file the index still uses
+    extension = 'zst' if codec == 'zstd' else 'gz'
+    return os.path.join(archive_dir, f'{day.strftime(DAY_FORMAT)}.{time.time_ns()}.nma.{extension}')
+
+class Archiver:
+    """Background job moving days older than max_age_days out of monitoring_history.
+
+    Give it its own Database so archiving never shares a connection with
+    the monitor thread.
+    """
+
+    def __init__(self, database, archive_dir, max_age_days=DEFAULT_MAX_AGE_DAYS, codec=None):
+        if database.segments is not None:
+            raise ValueError("Archiving reads monitoring_history and doesn't support a segment store")
+        self.database = database
+        self.archive_dir = os.path.abspath(archive_dir)
+        self.max_age_days = max_age_days
+        self.codec = codec or default_codec()
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def cutoff(self, now=None):
+        now = now or datetime.now(pytz.UTC)
+        return (now - timedelta(days=self.max_age_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def pending_days(self, now=None):
+        """Closed days older than the cutoff that still have rows in the hot table"""
+        cutoff = self.cutoff(now)
+        oldest = self.database.get_oldest_history_time()
+        if oldest is None:
+            return []
+        day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+        days = []
+        while day < cutoff:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def run_once(self, now=None):
+        """Archive every pending day; returns the number of rows moved"""
+        moved = 0
+        for day in self.pending_days(now):
+            if self._stop_event.is_set():
+                break
+            start = time.perf_counter()
+            rows = self.database.archive_history_day(day, self.archive_dir, self.codec)
+            if rows:
+                ARCHIVED_ROWS.inc(rows)
+                ARCHIVE_SECONDS.observe(time.perf_counter() - start)
+                logger.info("Archived %d rows from %s in %.1fs", rows,
+                            day.strftime(DAY_FORMAT), time.perf_counter() - start)
+            moved += rows
+        return moved
+
+    def start(self, interval=3600):
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _loop(self, interval):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Archive run failed")
+            self._stop_event.wait(interval)
@@ -0,0 +1,98 @@
+"""Scheduled online backups of the monitoring database.
+
+BackupJob snapshots the SQLite file with Database.backup into timestamped
+files and keeps the newest few. Only the SQLite database is copied; the
+segment store and archive directories, if used, are plain files that can
+be copied or rsynced as they are.
+
+    network_monitor-20261019T020000Z.db
+"""
+import glob
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+from instrumentation import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 7
+DEFAULT_PAGES_PER_STEP = 1024
+DEFAULT_STEP_SLEEP = 0.05
+
+BACKUPS_OK = REGISTRY.counter('network_monitor_backups', 'Database backups by result', result='ok')
+BACKUPS_FAILED = REGISTRY.counter('network_monitor_backups', 'Database backups by result', result='error')
+BACKUP_SECONDS = REGISTRY.histogram('network_monitor_backup_seconds', 'Time to snapshot the database')
+LAST_BACKUP = REGISTRY.gauge('network_monitor_last_backup_timestamp', 'Unix time of the last good backup')
+
+def backup_path(backup_dir, db_path, now=None):
+    now = now or datetime.now(pytz.UTC)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(backup_dir, f"{stem}-{now.strftime('%Y%m%dT%H%M%SZ')}.db")
+
+def prune_backups(backup_dir, db_path, keep):
+    """Delete all but the newest keep snapshots of db_path; returns the removed paths"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    # The timestamp suffix sorts chronologically
+    snapshots = sorted(glob.glob(os.path.join(backup_dir, f'{glob.escape(stem)}-*Z.db')))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+class BackupJob:
+    def __init__(self, database, backup_dir, keep=DEFAULT_KEEP,
+                 pages_per_step=DEFAULT_PAGES_PER_STEP, sleep=DEFAULT_STEP_SLEEP):
+        self.database = database
+        self.backup_dir = os.path.abspath(backup_dir)
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.sleep = sleep
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+    def run_once(self):
+        path = backup_path(self.backup_dir, self.database.db_path)
+        start = time.perf_counter()
+        try:
+            pages = self.database.backup(path, self.pages_per_step, self.sleep)
+        except Exception:
+            BACKUPS_FAILED.inc()
+            raise
+        elapsed = time.perf_counter() - start
+        BACKUPS_OK.inc()
+        BACKUP_SECONDS.observe(elapsed)
+        LAST_BACKUP.set(time.time())
+        logger.info("Backed up %d pages to %s in %.1fs", pages, path, elapsed)
+        for removed in prune_backups(self.backup_dir, self.database.db_path, self.keep):
+            logger.info("Removed old backup %s", removed)
+        return path
+
+    def start(self, interval=86400):
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _loop(self, interval):
+        # Snapshot at start too, or a daemon restarted more often than
+        # the interval would never take one
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Backup failed")
+            self._stop_event.wait(interval)
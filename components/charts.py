@@ -1,5 +1,5 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+# Plotly is imported inside the chart builders so pages without charts
+# (and the first paint of the dashboard) don't wait for it
 from datetime import datetime, timedelta
 import pytz
 
@@ -16,6 +16,8 @@ def convert_to_local_time(timestamps):
             for ts in timestamps]
 
 def create_response_time_chart(history):
+    import plotly.graph_objects as go
+
     times = [record['timestamp'] for record in history]
     # Convert timestamps to datetime objects if they're strings
     times = [datetime.fromisoformat(t) if isinstance(t, str) else t for t in times]
@@ -49,6 +51,8 @@ def create_response_time_chart(history):
     return fig
 
 def create_status_chart(history):
+    import plotly.graph_objects as go
+
     times = [record['timestamp'] for record in history]
     # Convert timestamps to datetime objects if they're strings
     times = [datetime.fromisoformat(t) if isinstance(t, str) else t for t in times]
@@ -81,6 +85,9 @@ def create_status_chart(history):
     return fig
 
 def create_detailed_metrics_chart(history, device):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
     times = [record['timestamp'] for record in history]
     # Convert timestamps to datetime objects if they're strings
     times = [datetime.fromisoformat(t) if isinstance(t, str) else t for t in times]
@@ -182,6 +189,9 @@ def create_detailed_metrics_chart(history, device):
     return fig
 
 def create_trend_chart(trends):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
     times = [record['time_bucket'] for record in trends]
     # Convert timestamps to datetime objects if they're strings
     times = [datetime.fromisoformat(t) if isinstance(t, str) else t for t in times]
@@ -191,7 +201,7 @@ def create_trend_chart(trends):
     fig = make_subplots(
         rows=2, cols=2,
         subplot_titles=(
-            'Average Response Time', 'Average Packet Loss',
+            'Response Time (avg, p95, p99)', 'Average Packet Loss',
             'Average Jitter', 'Availability'
         )
     )
@@ -203,6 +213,19 @@ def create_trend_chart(trends):
         row=1, col=1
     )
     
+    # Response time percentiles from the hourly sketches
+    if any(r.get('p95_response_time') is not None for r in trends):
+        fig.add_trace(
+            go.Scatter(x=times, y=[r.get('p95_response_time') for r in trends],
+                      name='p95 Response Time', line=dict(color='#1F618D', dash='dash')),
+            row=1, col=1
+        )
+        fig.add_trace(
+            go.Scatter(x=times, y=[r.get('p99_response_time') for r in trends],
+                      name='p99 Response Time', line=dict(color='#154360', dash='dot')),
+            row=1, col=1
+        )
+    
     # Average Packet Loss
     fig.add_trace(
         go.Scatter(x=times, y=[r['avg_packet_loss'] for r in trends],
@@ -231,3 +254,55 @@ def create_trend_chart(trends):
     )
     
     return fig
+
+def create_comparison_chart(series, labels):
+    """Overlay several devices' RTT, loss and availability on shared axes.
+
+    series maps device id to get_comparison_series points; labels maps
+    device id to its legend name. Each device keeps one colour and one
+    legend entry across the three rows.
+    """
+    import numpy as np
+    from plotly.colors import qualitative
+    from plotly.subplots import make_subplots
+
+    palette = qualitative.Dark24 + qualitative.Light24
+    fig = make_subplots(
+        rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+        subplot_titles=('Average Response Time (s)', 'Average Packet Loss (%)', 'Availability (%)')
+    )
+
+    # Devices share bucket boundaries, so convert each distinct bucket once.
+    # numpy arrays skip Plotly's per-element validation, which dominates
+    # with dozens of devices; local wall-clock times display the same as
+    # the aware datetimes used by the other charts.
+    buckets = sorted({point['time_bucket'] for points in series.values() for point in points})
+    local_times = {
+        bucket: local.replace(tzinfo=None)
+        for bucket, local in zip(buckets, convert_to_local_time(buckets))
+    }
+
+    traces, rows = [], []
+    for index, (device_id, points) in enumerate(series.items()):
+        times = np.array([local_times[point['time_bucket']] for point in points], dtype='datetime64[s]')
+        name = labels.get(device_id, str(device_id))
+        color = palette[index % len(palette)]
+        for row, field in enumerate(('avg_response_time', 'avg_packet_loss', 'availability'), start=1):
+            traces.append(dict(
+                type='scatter', x=times, y=np.array([point[field] for point in points], dtype=float),
+                mode='lines', name=name, legendgroup=str(device_id), showlegend=row == 1,
+                line=dict(color=color, width=1.5)
+            ))
+            rows.append(row)
+    fig.add_traces(traces, rows=rows, cols=[1] * len(rows))
+
+    fig.update_yaxes(rangemode='tozero', row=1, col=1)
+    fig.update_yaxes(rangemode='tozero', row=2, col=1)
+    fig.update_yaxes(range=[0, 100.5], row=3, col=1)
+    fig.update_layout(
+        height=750,
+        showlegend=True,
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+
+    return fig
@@ -0,0 +1,61 @@
+import streamlit as st
+from components.charts import create_comparison_chart
+from profiling import render_profiler
+from utils import format_duration
+
+TIME_RANGES = [6, 12, 24, 48, 72, 168, 720]
+# Points per device; the series query buckets the window down to this
+MAX_POINTS = 200
+
+def render_comparison(database):
+    st.header("Compare Devices")
+    profiler = render_profiler('comparison', database)
+
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        hours = st.selectbox(
+            "Time Range", TIME_RANGES, index=2,
+            format_func=lambda x: f"Last {x // 24} days" if x >= 168 else f"Last {x} hours"
+        )
+        mode = st.radio("Compare", ["Devices", "Tag"], horizontal=True)
+    with col1:
+        if mode == "Devices":
+            all_devices = profiler.query('get_devices', database.get_devices)
+            selected = st.multiselect(
+                "Devices", all_devices,
+                format_func=lambda d: f"{d['ip_address']} - {d['description']}" if d['description'] else d['ip_address'],
+                help="Up to about 50 devices stay readable on one chart"
+            )
+            devices, tag = selected, None
+        else:
+            tag = st.selectbox("Tag", [t['tag'] for t in profiler.query('get_tags', database.get_tags)])
+            devices = profiler.query('get_devices', database.get_devices, tag=tag) if tag else []
+
+    if not devices:
+        st.info("Select devices or a tag to compare.")
+        profiler.finish()
+        return
+
+    comparison = profiler.query(
+        'get_comparison_series', database.get_comparison_series,
+        device_ids=None if tag else [d['id'] for d in devices], tag=tag,
+        hours=hours, max_points=MAX_POINTS
+    )
+    if not comparison['series']:
+        st.info("No monitoring data for these devices in this time range yet.")
+        profiler.finish()
+        return
+
+    labels = {d['id']: d['ip_address'] for d in devices}
+    with profiler.phase('build_comparison_chart'):
+        figure = create_comparison_chart(comparison['series'], labels)
+    with profiler.phase('plotly_chart'):
+        st.plotly_chart(figure, use_container_width=True)
+
+    missing = len(devices) - len(comparison['series'])
+    st.caption(
+        f"{len(comparison['series'])} devices, {format_duration(comparison['bucket_seconds'])} buckets "
+        f"from {'hourly rollups' if comparison['source'] == 'rollups' else 'raw samples'}"
+        + (f"; {missing} without data in this range" if missing else "")
+    )
+    profiler.finish()
@@ -1,11 +1,13 @@
 import streamlit as st
 from datetime import datetime
-from utils import format_response_time, calculate_uptime
+from utils import format_response_time, format_duration
 from components.charts import (
     create_response_time_chart, create_status_chart,
     create_detailed_metrics_chart, create_trend_chart
 )
 from components.export import export_device_data_csv, export_device_report_pdf
+from components.monitor_health import render_monitor_health
+from profiling import render_profiler
 import base64
 
 def get_download_link(data, filename, text):
@@ -47,19 +49,43 @@ def render_deployment_instructions():
     # Rest of the deployment instructions...
     # (Previous deployment instructions code remains unchanged)
 
-def render_dashboard(database, monitor):
+def render_fleet_overview(database, hours, profiler):
+    """Group-level availability, RTT and violation summary"""
+    with st.expander("Fleet Overview", expanded=False):
+        group_by = st.radio(
+            "Group by", ["tag", "device_type"], horizontal=True,
+            format_func=lambda x: "Tag" if x == "tag" else "Device Type"
+        )
+        groups = profiler.query('get_fleet_aggregates', database.get_fleet_aggregates,
+                                group_by=group_by, hours=hours)
+        if not groups:
+            st.info("No monitoring data for this time range yet.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Group": g['name'],
+                    "Devices": g['devices'],
+                    "Availability %": round(g['availability'], 2),
+                    "Avg RTT": format_response_time(g['avg_rtt']) if g['avg_rtt'] is not None else "N/A",
+                    "p95 RTT": format_response_time(g['p95_rtt']) if g['p95_rtt'] is not None else "N/A",
+                    "Violations": g['violations'],
+                    "Anomalies": g['anomalies'],
+                }
+                for g in groups
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+def render_dashboard(database):
     st.title("Network Monitoring Dashboard")
+    profiler = render_profiler('dashboard', database)
     
     # Navigation tabs
-    tab1, tab2, tab3 = st.tabs(["Dashboard", "Device Manager", "Deployment Guide"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Dashboard", "Device Manager", "Deployment Guide", "Monitor Health"])
     
     with tab1:
-        # Get all devices
-        devices = database.get_devices()
-        if not devices:
-            st.warning("No devices configured. Add devices in the Device Manager.")
-            return
-
         # Time range selector for trends
         trend_hours = st.selectbox(
             "Trend Analysis Time Range",
@@ -68,11 +94,35 @@ def render_dashboard(database, monitor):
             format_func=lambda x: f"Last {x} hours"
         )
 
+        render_fleet_overview(database, trend_hours, profiler)
+
+        # Narrow the per-device sections to one tag or device type
+        filter_cols = st.columns(2)
+        with filter_cols[0]:
+            tag_filter = st.selectbox(
+                "Filter by Tag",
+                [None] + [t['tag'] for t in profiler.query('get_tags', database.get_tags)],
+                format_func=lambda x: "All tags" if x is None else x
+            )
+        with filter_cols[1]:
+            type_filter = st.selectbox(
+                "Filter by Device Type",
+                [None] + [t['device_type'] for t in profiler.query('get_device_types', database.get_device_types)],
+                format_func=lambda x: "All types" if x is None else x
+            )
+
+        devices = profiler.query('get_devices', database.get_devices, tag=tag_filter, device_type=type_filter)
+        if not devices:
+            st.warning("No devices configured. Add devices in the Device Manager.")
+            profiler.finish()
+            return
+
         # Create metrics grid
         cols = st.columns(len(devices))
         for idx, device in enumerate(devices):
             with cols[idx]:
-                history = database.get_device_history(device['id'], limit=100)
+                history = profiler.query('grid.get_device_history', database.get_device_history,
+                                         device['id'], limit=100, device_id=device['id'])
                 latest = history[0] if history else None
                 
                 # Show device type and status
@@ -84,16 +134,22 @@ def render_dashboard(database, monitor):
                     delta_color="inverse"
                 )
                 
-                uptime = calculate_uptime(history)
-                st.progress(uptime/100, f"Uptime: {uptime:.1f}%")
+                availability = profiler.query('grid.get_availability', database.get_availability,
+                                              device['id'], hours=trend_hours, device_id=device['id'])['availability']
+                if availability is None:
+                    st.progress(0.0, "Availability: N/A")
+                else:
+                    st.progress(availability/100, f"Availability ({trend_hours}h): {availability:.1f}%")
 
         # Detailed device sections
         for device in devices:
             st.markdown(f"### Device Details: {device['ip_address']} - {device['description']} ({device['device_type']})")
             with st.container():
                 try:
-                    history = database.get_device_history(device['id'], limit=100)
-                    trends = database.get_device_trends(device['id'], hours=trend_hours)
+                    history = profiler.query('get_device_history', database.get_device_history,
+                                             device['id'], limit=100, device_id=device['id'])
+                    trends = profiler.query('get_device_trends', database.get_device_trends,
+                                            device['id'], hours=trend_hours, device_id=device['id'])
                     
                     # Add export buttons in a row
                     col1, col2, _ = st.columns([1, 1, 2])
@@ -159,28 +215,47 @@ def render_dashboard(database, monitor):
                                 delta=f"Threshold: {format_response_time(threshold)}",
                                 delta_color="inverse" if threshold and jitter > threshold else "off"
                             )
+
+                        with metrics_cols[3]:
+                            summary = profiler.query('get_availability', database.get_availability,
+                                                     device['id'], hours=trend_hours, device_id=device['id'])
+                            st.metric(
+                                f"Availability ({trend_hours}h)",
+                                f"{summary['availability']:.2f}%" if summary['availability'] is not None else "N/A",
+                                delta=(f"{summary['outage_count']} outages, MTTR {format_duration(summary['mttr_seconds'])}, "
+                                       f"longest {format_duration(summary['longest_outage_seconds'])}"),
+                                delta_color="off"
+                            )
                         
-                        # Show threshold violations if any
-                        if latest['threshold_violations']:
+                        # Show threshold violations and detector flags if any
+                        violations = [v for v in latest['threshold_violations'] if not v.endswith('_anomaly')]
+                        anomalies = [v[:-len('_anomaly')] for v in latest['threshold_violations'] if v.endswith('_anomaly')]
+                        if violations:
                             st.warning(
                                 "⚠️ Threshold Violations: " + 
-                                ", ".join(v.replace('_', ' ').title() for v in latest['threshold_violations'])
+                                ", ".join(v.replace('_', ' ').title() for v in violations)
+                            )
+                        if anomalies:
+                            st.info(
+                                "📈 Unusual Behaviour: " +
+                                ", ".join(v.replace('_', ' ').title() for v in anomalies)
                             )
                     
                     # Charts
                     chart_tabs = st.tabs(["Real-time Metrics", "Trend Analysis"])
                     
                     with chart_tabs[0]:
-                        st.plotly_chart(
-                            create_detailed_metrics_chart(history, device),
-                            use_container_width=True
-                        )
+                        with profiler.phase('build_detailed_chart', device['id']):
+                            figure = create_detailed_metrics_chart(history, device)
+                        # Serializing the figure for the browser happens in plotly_chart
+                        with profiler.phase('plotly_chart', device['id']):
+                            st.plotly_chart(figure, use_container_width=True)
                     
                     with chart_tabs[1]:
-                        st.plotly_chart(
-                            create_trend_chart(trends),
-                            use_container_width=True
-                        )
+                        with profiler.phase('build_trend_chart', device['id']):
+                            figure = create_trend_chart(trends)
+                        with profiler.phase('plotly_chart', device['id']):
+                            st.plotly_chart(figure, use_container_width=True)
                 except Exception as e:
                     st.error(f"Error loading device details: {str(e)}")
             
@@ -193,6 +268,11 @@ def render_dashboard(database, monitor):
     with tab3:
         render_deployment_instructions()
 
+    with tab4:
+        render_monitor_health()
+
+    profiler.finish()
+
     # Auto-refresh every 60 seconds
     st.empty()
     st.markdown(
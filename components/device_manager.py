@@ -1,8 +1,14 @@
+import threading
 import streamlit as st
+from discovery import (DEFAULT_RATE, DEFAULT_TIMEOUT, DEFAULT_WORKERS, device_from_host,
+                       discover, expand_targets, load_inventory)
+from probes import DEFAULT_PORTS, PROBE_TYPES
+from profiling import render_profiler
 from utils import validate_ip
 
 def render_device_manager(database):
     st.header("Device Manager")
+    profiler = render_profiler('device_manager', database)
     
     # Device type options
     DEVICE_TYPES = [
@@ -25,6 +31,18 @@ def render_device_manager(database):
             description = st.text_input("Description")
             tags = st.text_input("Tags (comma-separated)")
             device_type = st.selectbox("Device Type", [""] + DEVICE_TYPES)
+            probe_type = st.selectbox(
+                "Probe", PROBE_TYPES,
+                help="Use tcp, http or dns for devices that drop ICMP"
+            )
+            probe_port = st.number_input(
+                "Probe Port", min_value=0, max_value=65535, value=0,
+                help="0 uses the default: " + ", ".join(f"{t} {p}" for t, p in DEFAULT_PORTS.items())
+            )
+            probe_target = st.text_input(
+                "Probe Target",
+                help="HTTP path or URL, or the name to resolve for DNS"
+            )
         
         with col2:
             st.subheader("Performance Thresholds")
@@ -61,80 +79,251 @@ def render_device_manager(database):
                 tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
                 database.add_device(
                     ip_address, description, tag_list, device_type,
-                    response_time, packet_loss, jitter
+                    response_time, packet_loss, jitter,
+                    probe_type, probe_port or None, probe_target.strip() or None
                 )
                 st.success("Device added successfully!")
                 st.rerun()
 
+    with profiler.phase('discovery_panel'):
+        render_discovery(database, DEVICE_TYPES)
+    with profiler.phase('import_panel'):
+        render_inventory_import(database)
+
     # List and manage existing devices
+    render_device_table(database, DEVICE_TYPES, profiler)
+    profiler.finish()
+
+PAGE_SIZES = [50, 100, 250, 500]
+THRESHOLD_COLUMNS = ['response_time_threshold', 'packet_loss_threshold', 'jitter_threshold']
+
+def render_device_table(database, device_types, profiler):
+    import pandas as pd
+
     st.subheader("Existing Devices")
-    devices = database.get_devices()
-    
-    for device in devices:
-        st.markdown(f"### {device['ip_address']} - {device['description']}")
-        with st.container():
-            with st.form(f"edit_device_{device['id']}"):
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    new_ip = st.text_input("IP Address", value=device['ip_address'])
-                    new_desc = st.text_input("Description", value=device['description'])
-                    new_tags = st.text_input(
-                        "Tags",
-                        value=",".join(device['tags'] if device['tags'] else [])
-                    )
-                    new_type = st.selectbox(
-                        "Device Type",
-                        [""] + DEVICE_TYPES,
-                        index=DEVICE_TYPES.index(device['device_type']) + 1 
-                        if device['device_type'] in DEVICE_TYPES else 0
-                    )
-                
-                with col2:
-                    st.subheader("Performance Thresholds")
-                    new_response_time = st.number_input(
-                        "Response Time Threshold (seconds)",
-                        min_value=0.0,
-                        value=float(device['response_time_threshold'] or 1.0),
-                        step=0.1,
-                        key=f"rt_{device['id']}"
-                    )
-                    new_packet_loss = st.number_input(
-                        "Packet Loss Threshold (%)",
-                        min_value=0.0,
-                        max_value=100.0,
-                        value=float(device['packet_loss_threshold'] or 5.0),
-                        step=1.0,
-                        key=f"pl_{device['id']}"
-                    )
-                    new_jitter = st.number_input(
-                        "Jitter Threshold (seconds)",
-                        min_value=0.0,
-                        value=float(device['jitter_threshold'] or 0.1),
-                        step=0.01,
-                        key=f"j_{device['id']}"
-                    )
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.form_submit_button("Update"):
-                        if not validate_ip(new_ip):
-                            st.error("Invalid IP address format")
-                        elif not new_type:
-                            st.error("Please select a device type")
-                        else:
-                            tag_list = [tag.strip() for tag in new_tags.split(",") if tag.strip()]
-                            database.update_device(
-                                device['id'], new_ip, new_desc, tag_list,
-                                new_type, new_response_time, new_packet_loss, new_jitter
-                            )
-                            st.success("Device updated successfully!")
-                            st.rerun()
-                
-                with col2:
-                    if st.form_submit_button("Delete", type="primary"):
-                        database.delete_device(device['id'])
-                        st.success("Device deleted successfully!")
-                        st.rerun()
-        
-        st.markdown("---")  # Add separator between devices
+
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        search = st.text_input("Search", placeholder="IP address or description")
+    with col2:
+        tag_options = ["All tags"] + [t['tag'] for t in profiler.query('get_tags', database.get_tags)]
+        tag = st.selectbox("Tag", tag_options, key="device_table_tag")
+    with col3:
+        type_options = ["All types"] + [t['device_type'] for t in profiler.query('get_device_types', database.get_device_types)]
+        device_type = st.selectbox("Type", type_options, key="device_table_type")
+    with col4:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key="device_table_page_size")
+
+    filters = {
+        'tag': None if tag == "All tags" else tag,
+        'device_type': None if device_type == "All types" else device_type,
+        'search': search.strip() or None,
+    }
+    with profiler.phase('count_devices'):
+        total = database.count_devices(**filters)
+    if not total:
+        st.info("No devices match the filters")
+        return
+    pages = (total - 1) // page_size + 1
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    devices = profiler.query('get_devices', database.get_devices,
+                             **filters, limit=page_size, offset=(page - 1) * page_size)
+
+    with profiler.phase('build_dataframe'):
+        original = pd.DataFrame([
+            {
+                'id': device['id'],
+                'ip_address': device['ip_address'],
+                'description': device['description'] or '',
+                'tags': ", ".join(device['tags']),
+                'device_type': device['device_type'] or '',
+                'response_time_threshold': device['response_time_threshold'],
+                'packet_loss_threshold': device['packet_loss_threshold'],
+                'jitter_threshold': device['jitter_threshold'],
+                'probe_type': device['probe_type'],
+                'probe_port': device['probe_port'],
+                'probe_target': device['probe_target'] or '',
+                'delete': False,
+            }
+            for device in devices
+        ]).set_index('id')
+
+    # The key follows the page and filters so edits never leak onto other rows
+    with profiler.phase('data_editor'):
+        edited = st.data_editor(
+            original,
+            key=f"device_table_{page}_{page_size}_{tag}_{device_type}_{search}",
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'ip_address': st.column_config.TextColumn("IP Address", required=True),
+                'description': st.column_config.TextColumn("Description"),
+                'tags': st.column_config.TextColumn("Tags", help="Comma-separated"),
+                'device_type': st.column_config.SelectboxColumn("Device Type", options=device_types, required=True),
+                'response_time_threshold': st.column_config.NumberColumn(
+                    "Response Time (s)", min_value=0.0, step=0.1, format="%.3f"),
+                'packet_loss_threshold': st.column_config.NumberColumn(
+                    "Packet Loss (%)", min_value=0.0, max_value=100.0, step=1.0),
+                'jitter_threshold': st.column_config.NumberColumn(
+                    "Jitter (s)", min_value=0.0, step=0.01, format="%.3f"),
+                'probe_type': st.column_config.SelectboxColumn("Probe", options=PROBE_TYPES, required=True),
+                'probe_port': st.column_config.NumberColumn(
+                    "Port", min_value=1, max_value=65535, step=1, format="%d",
+                    help="Empty uses the probe's default port"),
+                'probe_target': st.column_config.TextColumn(
+                    "Target", help="HTTP path or URL, or the name to resolve for DNS"),
+                'delete': st.column_config.CheckboxColumn("Delete"),
+            },
+        )
+    st.caption(f"Showing {len(devices)} of {total} devices")
+
+    with profiler.phase('diff_edits'):
+        fields = [column for column in original.columns if column != 'delete']
+        to_delete = edited.index[edited['delete']].tolist()
+        # Only rows that differ are written (NaN == NaN counts as unchanged)
+        differs = (edited[fields] != original[fields]) & ~(edited[fields].isna() & original[fields].isna())
+        changed = edited[differs.any(axis=1) & ~edited['delete']]
+    if not to_delete and changed.empty:
+        return
+
+    st.write(f"{len(changed)} edited, {len(to_delete)} to delete")
+    if st.button("Save changes", type="primary"):
+        updates = []
+        errors = []
+        for device_id, row in changed.iterrows():
+            if not validate_ip(str(row['ip_address'] or '').strip()):
+                errors.append(f"Invalid IP address {row['ip_address']!r}")
+                continue
+            if not row['device_type']:
+                errors.append(f"Please select a device type for {row['ip_address']}")
+                continue
+            updates.append({
+                'id': device_id,
+                'ip_address': row['ip_address'].strip(),
+                'description': row['description'] or '',
+                'tags': [t.strip() for t in (row['tags'] or '').split(",") if t.strip()],
+                'device_type': row['device_type'],
+                **{field: None if pd.isna(row[field]) else float(row[field]) for field in THRESHOLD_COLUMNS},
+                'probe_type': row['probe_type'],
+                'probe_port': None if pd.isna(row['probe_port']) else int(row['probe_port']),
+                'probe_target': (row['probe_target'] or '').strip() or None,
+            })
+        if errors:
+            for error in errors:
+                st.error(error)
+            return
+        database.apply_device_changes(updates, to_delete)
+        st.success(f"Updated {len(updates)} and deleted {len(to_delete)} devices")
+        st.rerun()
+
+def render_discovery(database, device_types):
+    import pandas as pd
+
+    with st.expander("Discover Devices"):
+        cidrs = st.text_area(
+            "Networks to scan",
+            placeholder="192.168.1.0/24\n10.20.0.0/16",
+            help="One CIDR range or IP address per line, up to a /16 in total"
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            rate = st.number_input("Probes per second", min_value=1, value=DEFAULT_RATE, step=50)
+        with col2:
+            workers = st.number_input("Concurrent probes", min_value=1, max_value=1024,
+                                      value=DEFAULT_WORKERS, step=32)
+        with col3:
+            timeout = st.number_input("Timeout (seconds)", min_value=0.1,
+                                      value=DEFAULT_TIMEOUT, step=0.5)
+
+        if st.button("Scan"):
+            try:
+                targets = expand_targets(cidrs.splitlines())
+            except ValueError as e:
+                st.error(str(e))
+                targets = []
+            if targets:
+                # One stop event per session: a rerun interrupting this scan
+                # sets it inside discover(), and a new scan stops any older one
+                previous = st.session_state.get('discovery_stop')
+                if previous is not None:
+                    previous.set()
+                stop_event = st.session_state['discovery_stop'] = threading.Event()
+                progress = st.progress(0.0, text=f"Scanning {len(targets)} addresses")
+                results = discover(
+                    targets, rate=rate, workers=int(workers), timeout=timeout,
+                    progress=lambda done, total: progress.progress(
+                        done / total, text=f"Scanned {done}/{total} addresses"),
+                    stop_event=stop_event
+                )
+                known = {device['ip_address'] for device in database.get_devices()}
+                st.session_state['discovered_hosts'] = [
+                    {
+                        'add': host['ip_address'] not in known,
+                        'ip_address': host['ip_address'],
+                        'response_time_ms': round(host['response_time'] * 1000, 2),
+                        'already_monitored': host['ip_address'] in known,
+                    }
+                    for host in results if host['alive']
+                ]
+                st.session_state['discovered_scanned'] = len(targets)
+
+        hosts = st.session_state.get('discovered_hosts')
+        if hosts is None:
+            return
+        st.write(f"{len(hosts)} of {st.session_state['discovered_scanned']} addresses answered")
+        if not hosts:
+            return
+        edited = st.data_editor(
+            pd.DataFrame(hosts),
+            hide_index=True,
+            disabled=['ip_address', 'response_time_ms', 'already_monitored'],
+            key='discovered_editor'
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            device_type = st.selectbox("Device type for new devices", device_types,
+                                       index=len(device_types) - 1)
+        with col2:
+            tags = st.text_input("Tags for new devices", value="discovered")
+        selected = edited[edited['add']]['ip_address'].tolist()
+        if st.button(f"Add {len(selected)} selected devices", disabled=not selected):
+            tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
+            ids = database.add_devices([
+                device_from_host(ip_address, tags=tag_list, device_type=device_type)
+                for ip_address in selected
+            ])
+            st.session_state.pop('discovered_hosts', None)
+            st.success(f"Added {len(ids)} devices")
+            st.rerun()
+
+def render_inventory_import(database):
+    import pandas as pd
+
+    with st.expander("Import Inventory"):
+        st.caption(
+            "CSV with an ip_address column, or a YAML list of devices. Optional fields: "
+            "description, tags, device_type, response_time_threshold, "
+            "packet_loss_threshold, jitter_threshold, probe_type, probe_port, probe_target."
+        )
+        uploaded = st.file_uploader("Inventory file", type=['csv', 'yaml', 'yml'])
+        if uploaded is None:
+            return
+        try:
+            devices, errors = load_inventory(uploaded.getvalue(), uploaded.name.rsplit('.', 1)[-1].lower())
+        except (RuntimeError, ValueError) as e:
+            st.error(str(e))
+            return
+        for error in errors[:20]:
+            st.warning(error)
+        if len(errors) > 20:
+            st.warning(f"... and {len(errors) - 20} more invalid rows")
+        if not devices:
+            return
+        preview = pd.DataFrame(devices)
+        preview['tags'] = preview['tags'].apply(", ".join)
+        st.dataframe(preview, hide_index=True)
+        if st.button(f"Import {len(devices)} devices", disabled=bool(errors),
+                     help="Fix the invalid rows first" if errors else None):
+            ids = database.add_devices(devices)
+            st.success(f"Imported {len(ids)} devices ({len(devices) - len(ids)} already monitored)")
+            st.rerun()
@@ -1,20 +1,22 @@
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from datetime import datetime
+# pandas and ReportLab are imported inside the export functions, so the
+# dashboard only pays for them when someone actually exports
+from datetime import datetime, timedelta
 import io
+import pytz
 
 def export_device_data_csv(database, device_id, hours=24):
     try:
+        import pandas as pd
+
         # Get device details
         device = next((d for d in database.get_devices() if d['id'] == device_id), None)
         if not device:
             return None
         
-        # Get monitoring data
-        history = database.get_device_history(device_id, limit=None)
+        # Get monitoring data for the window only, so archived days
+        # outside it are never decoded
+        history = database.get_device_history(
+            device_id, limit=None, start=datetime.now(pytz.UTC) - timedelta(hours=hours))
         if not history:
             return None
 
@@ -40,6 +42,11 @@ def export_device_data_csv(database, device_id, hours=24):
 
 def export_device_report_pdf(database, device_id, hours=24):
     try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+
         # Get device details
         device = next((d for d in database.get_devices() if d['id'] == device_id), None)
         if not device:
@@ -86,7 +93,8 @@ def export_device_report_pdf(database, device_id, hours=24):
         elements.append(Spacer(1, 20))
         
         # Performance Metrics
-        history = database.get_device_history(device_id, limit=24)  # Last 24 records
+        history = database.get_device_history(
+            device_id, limit=24, start=datetime.now(pytz.UTC) - timedelta(hours=hours))  # Last 24 records
         if history:
             latest = history[0]
             metrics_data = [
@@ -0,0 +1,116 @@
+import json
+import os
+import urllib.error
+import urllib.request
+import streamlit as st
+
+from instrumentation import REGISTRY
+
+# Where the headless monitor daemon serves its health endpoint
+MONITOR_STATUS_URL = os.environ.get('NETWORK_MONITOR_STATUS_URL', 'http://127.0.0.1:8765')
+
+def fetch_monitor_status(base_url=MONITOR_STATUS_URL, timeout=0.5):
+    """Fetch the daemon health document, or None if the daemon is unreachable"""
+    try:
+        with urllib.request.urlopen(f"{base_url}/health", timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 503 still carries the status document
+        try:
+            return json.loads(e.read())
+        except ValueError:
+            return None
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+def render_monitor_status():
+    """Compact daemon status indicator for the sidebar"""
+    status = fetch_monitor_status()
+    if status is None:
+        st.sidebar.error("Monitor daemon not reachable. Start it with `python daemon.py`.")
+    elif status.get('status') == 'ok':
+        st.sidebar.success(f"Monitor daemon running (sweep #{status.get('sweep_count', 0)})")
+    else:
+        st.sidebar.warning(f"Monitor daemon unhealthy: {status.get('last_error') or 'stalled'}")
+
+def _format_seconds(value):
+    if value is None:
+        return "N/A"
+    if value < 1:
+        return f"{value*1000:.1f} ms"
+    return f"{value:.1f} s"
+
+def _query_rows(metrics):
+    """Per-query latency rows from a metrics snapshot, skipping uncalled queries"""
+    rows = []
+    for name, values in sorted(metrics.items()):
+        if name.startswith('network_monitor_db_query_seconds') and values.get('count'):
+            method = name.split('method="', 1)[-1].rstrip('"}')
+            rows.append({
+                'Query': method,
+                'Calls': values.get('count', 0),
+                'Avg': _format_seconds(values.get('avg')),
+                'p95': _format_seconds(values.get('p95')),
+            })
+    return rows
+
+def render_monitor_health():
+    """Panel showing the daemon's own instrumentation and the dashboard's query latency"""
+    st.subheader("Monitor Health")
+    status = fetch_monitor_status(timeout=2)
+    if status is None:
+        st.error("Monitor daemon not reachable. Start it with `python daemon.py`.")
+        return
+
+    metrics = status.get('metrics', {})
+
+    def hist(name):
+        return metrics.get(name, {})
+
+    def count(name):
+        return metrics.get(name, {}).get('value', 0)
+
+    cols = st.columns(4)
+    with cols[0]:
+        st.metric("Status", status.get('status', 'unknown').upper())
+        st.metric("Sweeps", status.get('sweep_count', 0))
+    with cols[1]:
+        sweep = hist('network_monitor_sweep_seconds')
+        st.metric("Last Sweep", _format_seconds(sweep.get('last')),
+                  delta=f"p95 {_format_seconds(sweep.get('p95'))}", delta_color="off")
+        lag = hist('network_monitor_schedule_lag_seconds')
+        st.metric("Schedule Lag", _format_seconds(lag.get('last')),
+                  delta=f"p99 {_format_seconds(lag.get('p99'))}", delta_color="off")
+    with cols[2]:
+        ping_hist = hist('network_monitor_ping_seconds')
+        st.metric("Ping Call p50", _format_seconds(ping_hist.get('p50')),
+                  delta=f"p95 {_format_seconds(ping_hist.get('p95'))}", delta_color="off")
+        st.metric("Queued Devices", metrics.get('network_monitor_sweep_pending_devices', {}).get('value', 0))
+    with cols[3]:
+        write = hist('network_monitor_db_write_seconds')
+        st.metric("DB Write p50", _format_seconds(write.get('p50')),
+                  delta=f"p95 {_format_seconds(write.get('p95'))}", delta_color="off")
+        st.metric("Sweep Errors", count('network_monitor_sweep_errors'))
+
+    pings_ok = count('network_monitor_pings{result="ok"}')
+    pings_timeout = count('network_monitor_pings{result="timeout"}')
+    pings_error = count('network_monitor_pings{result="error"}')
+    queue = hist('network_monitor_probe_queue_seconds')
+    st.caption(f"Pings: {pings_ok} ok, {pings_timeout} timed out, {pings_error} failed; "
+               f"queued for a probe slot p95 {_format_seconds(queue.get('p95'))}")
+
+    if status.get('last_error'):
+        st.warning(f"Last sweep error: {status['last_error']}")
+
+    # Per-query latency tables. Each process keeps its own registry: the
+    # daemon's covers its writes and rollups, while the dashboard's page
+    # queries are only recorded here in the Streamlit process.
+    rows = _query_rows(metrics)
+    if rows:
+        st.markdown("**Queries in the daemon process**")
+        st.table(rows)
+    st.caption(f"Raw daemon metrics: {MONITOR_STATUS_URL}/metrics")
+    rows = _query_rows(REGISTRY.snapshot())
+    if rows:
+        st.markdown("**Queries in this dashboard process**")
+        st.table(rows)
@@ -0,0 +1,234 @@
+"""Headless monitoring daemon.
+
+Runs the NetworkMonitor outside of Streamlit so probes keep their schedule
+no matter how many people have the dashboard open. The dashboard only reads
+what this process writes to the database.
+
+    python daemon.py --db network_monitor.db --status-port 8765
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from archive import DEFAULT_MAX_AGE_DAYS, Archiver
+from backup import DEFAULT_KEEP, BackupJob
+from database import Database
+from instrumentation import REGISTRY
+from monitoring import DEFAULT_CONCURRENCY, NetworkMonitor
+from simulator import NetworkSimulator
+
+DEFAULT_PIDFILE = 'network_monitor.pid'
+DEFAULT_STATUS_HOST = '127.0.0.1'
+DEFAULT_STATUS_PORT = 8765
+
+logger = logging.getLogger('network_monitor.daemon')
+
+class PidFile:
+    """Refuses to start a second daemon against the same pidfile"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _running_pid(self):
+        try:
+            with open(self.path) as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass  # Process exists but belongs to another user
+        return pid
+
+    def acquire(self):
+        pid = self._running_pid()
+        if pid is not None and pid != os.getpid():
+            raise RuntimeError(f"Monitor daemon already running with pid {pid} ({self.path})")
+        with open(self.path, 'w') as f:
+            f.write(f"{os.getpid()}\n")
+
+    def release(self):
+        if self._running_pid() == os.getpid():
+            os.remove(self.path)
+
+class StatusServer:
+    """Local HTTP endpoint exposing the monitor's health and metrics"""
+
+    def __init__(self, monitor, host=DEFAULT_STATUS_HOST, port=DEFAULT_STATUS_PORT):
+        self.monitor = monitor
+        self.routes = {
+            '/health': self._health,
+            '/metrics': self._metrics,
+        }
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                route = server.routes.get(self.path.split('?', 1)[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+                code, content_type, body = route()
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("status request: " + format, *args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def _health(self):
+        status = self.monitor.get_status()
+        status['pid'] = os.getpid()
+        status['database'] = self.monitor.database.db_path
+        healthy = status['running'] and not status['stale']
+        status['status'] = 'ok' if healthy else 'unhealthy'
+        status['metrics'] = REGISTRY.snapshot()
+        body = json.dumps(status).encode()
+        return (200 if healthy else 503), 'application/json', body
+
+    def _metrics(self):
+        body = REGISTRY.render_prometheus().encode()
+        return 200, 'text/plain; version=0.0.4; charset=utf-8', body
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Network monitoring daemon")
+    parser.add_argument('--db', default=None,
+                        help="SQLite database path (default: $NETWORK_MONITOR_DB or network_monitor.db)")
+    parser.add_argument('--segment-dir', default=None,
+                        help="Store raw samples in a columnar segment directory "
+                             "(default: $NETWORK_MONITOR_SEGMENT_DIR, unset keeps them in SQLite)")
+    parser.add_argument('--interval', type=float, default=60,
+                        help="Seconds between probe sweeps")
+    parser.add_argument('--ping-delay', type=float, default=0.2,
+                        help="Pause between the pings sent to one device")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="Probes in flight at once across all devices and probe types")
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+                        help="Probe N simulated devices instead of the network "
+                             "(adds them to the database; use a scratch --db)")
+    parser.add_argument('--sim-seed', type=int, default=0)
+    parser.add_argument('--archive-dir', default=None,
+                        help="Move history older than --archive-after-days into compressed "
+                             "files in this directory (disabled by default)")
+    parser.add_argument('--archive-after-days', type=int, default=DEFAULT_MAX_AGE_DAYS)
+    parser.add_argument('--archive-interval', type=float, default=3600,
+                        help="Seconds between archive runs")
+    parser.add_argument('--backup-dir', default=None,
+                        help="Write online snapshots of the database to this directory (disabled by default)")
+    parser.add_argument('--backup-interval', type=float, default=86400,
+                        help="Seconds between backups")
+    parser.add_argument('--backup-keep', type=int, default=DEFAULT_KEEP,
+                        help="Number of snapshots to keep")
+    parser.add_argument('--pidfile', default=DEFAULT_PIDFILE)
+    parser.add_argument('--status-host', default=DEFAULT_STATUS_HOST)
+    parser.add_argument('--status-port', type=int, default=DEFAULT_STATUS_PORT,
+                        help="Port for the health and metrics endpoints, 0 disables them")
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    if args.archive_dir and (args.segment_dir or os.environ.get('NETWORK_MONITOR_SEGMENT_DIR')):
+        # The archiver moves rows out of monitoring_history, which a segment
+        # store doesn't write to, so the two would serve overlapping samples
+        parser.error("--archive-dir can't be combined with a segment store")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+
+    pidfile = PidFile(args.pidfile)
+    try:
+        pidfile.acquire()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+
+    shutdown = threading.Event()
+
+    def _handle_signal(signum, frame):
+        logger.info("Received %s, shutting down", signal.Signals(signum).name)
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    status_server = None
+    archiver = None
+    backup_job = None
+    try:
+        db = Database(args.db, segment_dir=args.segment_dir)
+        backend = None
+        if args.simulate:
+            backend = NetworkSimulator.fleet(args.simulate, seed=args.sim_seed)
+            added = backend.populate(db)
+            logger.info("Simulating %d devices (%d added to the database)", args.simulate, added)
+        monitor = NetworkMonitor(db, interval=args.interval, backend=backend,
+                                 ping_delay=args.ping_delay, concurrency=args.concurrency)
+        if args.status_port:
+            status_server = StatusServer(monitor, args.status_host, args.status_port)
+            status_server.start()
+            logger.info("Health and metrics on http://%s:%d/health and /metrics",
+                        args.status_host, args.status_port)
+
+        if args.archive_dir:
+            # Own connection, so a long archive run never holds up probe writes
+            archiver = Archiver(Database(args.db, segment_dir=args.segment_dir), args.archive_dir,
+                                args.archive_after_days)
+            archiver.start(args.archive_interval)
+            logger.info("Archiving history older than %d days to %s (%s)",
+                        args.archive_after_days, archiver.archive_dir, archiver.codec)
+
+        if args.backup_dir:
+            backup_job = BackupJob(db, args.backup_dir, args.backup_keep)
+            backup_job.start(args.backup_interval)
+            logger.info("Backing up to %s every %ss, keeping %d",
+                        backup_job.backup_dir, args.backup_interval, args.backup_keep)
+
+        monitor.start_monitoring()
+        logger.info("Monitoring %s every %ss (pid %d)", db.db_path, args.interval, os.getpid())
+
+        shutdown.wait()
+
+        # Cancels the sweep in progress: probes in flight are dropped without
+        # a record, records already queued are written, and every device is
+        # marked unknown until the monitor runs again
+        monitor.stop_monitoring()
+        if backup_job:
+            backup_job.stop()
+        if archiver:
+            archiver.stop()
+            archiver.database.conn.close()
+        db.conn.close()
+    finally:
+        if status_server:
+            status_server.stop()
+        pidfile.release()
+    logger.info("Monitor stopped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
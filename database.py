@@ -1,13 +1,86 @@
+import os
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 import pytz
+import archive
+from anomaly import EwmaDetector
+from instrumentation import REGISTRY, timed
+from probes import PROBE_TYPES
+from profiling import STARTUP
+from segment_store import COLUMNS as SEGMENT_COLUMNS, METRIC_COLUMNS, SegmentStore, encode_flags
+from sketches import QuantileSketch
+from utils import summarize_availability, validate_ip
+
+DEFAULT_DB_PATH = 'network_monitor.db'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+BUCKET_FORMAT = '%Y-%m-%d %H:00:00'
+
+# Samples whose threshold_violations hold a hard threshold breach; detector
+# flags (e.g. response_time_anomaly) don't match and are counted by _ANOMALY_SQL
+_VIOLATION_SQL = (
+    "((',' || COALESCE(threshold_violations, '') || ',') LIKE '%,response_time,%' "
+    "OR (',' || COALESCE(threshold_violations, '') || ',') LIKE '%,packet_loss,%' "
+    "OR (',' || COALESCE(threshold_violations, '') || ',') LIKE '%,jitter,%')"
+)
+_ANOMALY_SQL = "(COALESCE(threshold_violations, '') LIKE '%anomaly%')"
+
+ANOMALIES = REGISTRY.counter('network_monitor_anomalies', 'Samples flagged by the streaming detector')
+
+def _parse_timestamp(value):
+    try:
+        # Try parsing with microseconds
+        parsed = datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        # Fall back to parsing without microseconds
+        parsed = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    return parsed.replace(tzinfo=pytz.UTC)
+
+def _format_timestamp(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(pytz.UTC)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+def _probe_columns(device):
+    """(probe_type, probe_port, probe_target) for a device dict, validated"""
+    probe_type = device.get('probe_type') or 'icmp'
+    if probe_type not in PROBE_TYPES:
+        raise ValueError(f"Unknown probe type {probe_type!r} for {device.get('ip_address')}")
+    probe_port = device.get('probe_port')
+    if probe_port is not None:
+        probe_port = int(probe_port)
+        if not 0 < probe_port < 65536:
+            raise ValueError(f"Invalid probe port {probe_port} for {device.get('ip_address')}")
+    return probe_type, probe_port, device.get('probe_target') or None
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('network_monitor.db', check_same_thread=False)
+    def __init__(self, db_path=None, segment_dir=None):
+        # The monitor daemon and the dashboard open the same file from
+        # separate processes, so both resolve the path the same way
+        self.db_path = db_path or os.environ.get('NETWORK_MONITOR_DB', DEFAULT_DB_PATH)
+        # Optional columnar engine for raw samples; devices, transitions
+        # and rollups always stay in SQLite
+        segment_dir = segment_dir or os.environ.get('NETWORK_MONITOR_SEGMENT_DIR')
+        self.segments = SegmentStore(segment_dir) if segment_dir else None
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
         # Enable dictionary cursor by default
         self.conn.row_factory = sqlite3.Row
-        self.create_tables()
+        # WAL lets dashboard reads proceed while the daemon is writing
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Per-device baselines for anomaly flags, kept in memory
+        self.anomaly_detector = EwmaDetector()
+        # Last recorded up/down state per device (None: unknown), to detect
+        # transitions, and when each device was last sampled, to spot gaps
+        self._last_status = {}
+        self._last_sample_at = {}
+        # Open hourly rollup per device, updated in memory and upserted per sample
+        self._rollups = {}
+        # Stored rows read and decoded by queries, counted per thread (one
+        # per Streamlit session) so the render profiler can diff it
+        self._decoded = threading.local()
+        with STARTUP.phase('Database.create_tables'):
+            self.create_tables()
 
     def create_tables(self):
         with self.conn:
@@ -22,10 +95,19 @@ class Database:
                     response_time_threshold FLOAT,
                     packet_loss_threshold FLOAT,
                     jitter_threshold FLOAT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    probe_type TEXT NOT NULL DEFAULT 'icmp',
+                    probe_port INTEGER,
+                    probe_target TEXT
                 )
             ''')
             
+            # Per-device probe selection (see probes.PROBE_TYPES), added to
+            # databases created before it existed
+            self._add_column('devices', 'probe_type', "TEXT NOT NULL DEFAULT 'icmp'")
+            self._add_column('devices', 'probe_port', 'INTEGER')
+            self._add_column('devices', 'probe_target', 'TEXT')
+
             # Monitoring history table
             self.conn.execute('''
                 CREATE TABLE IF NOT EXISTS monitoring_history (
@@ -43,103 +125,781 @@ class Database:
                     FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE
                 )
             ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_monitoring_history_device_time
+                ON monitoring_history (device_id, timestamp)
+            ''')
+
+            # Up/down state changes only, so availability over any window is
+            # an index seek plus the handful of transitions inside it
+            has_transitions = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'device_state_transitions'"
+            ).fetchone()
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS device_state_transitions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    device_id INTEGER REFERENCES devices(id),
+                    status INTEGER,
+                    timestamp TIMESTAMP,
+                    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE
+                )
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_state_transitions_device_time
+                ON device_state_transitions (device_id, timestamp)
+            ''')
+            # Normalized tags so grouping and filtering happen in SQL; the
+            # comma-joined devices.tags column is kept in sync for display
+            has_tags = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'device_tags'"
+            ).fetchone()
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS device_tags (
+                    device_id INTEGER NOT NULL REFERENCES devices(id),
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (device_id, tag),
+                    FOREIGN KEY (device_id) REFERENCES devices(id) ON DELETE CASCADE
+                )
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_device_tags_tag
+                ON device_tags (tag, device_id)
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_devices_device_type
+                ON devices (device_type)
+            ''')
+            if not has_tags:
+                for row in self.conn.execute("SELECT id, tags FROM devices").fetchall():
+                    self._set_device_tags(row['id'], row['tags'].split(',') if row['tags'] else [])
+            # Hourly per-device aggregates with a response-time quantile
+            # sketch, so trends and percentiles never scan raw samples
+            has_rollups = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monitoring_rollups'"
+            ).fetchone()
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS monitoring_rollups (
+                    device_id INTEGER NOT NULL REFERENCES devices(id),
+                    bucket_start TIMESTAMP NOT NULL,
+                    sample_count INTEGER NOT NULL DEFAULT 0,
+                    up_count INTEGER NOT NULL DEFAULT 0,
+                    response_time_sum FLOAT NOT NULL DEFAULT 0,
+                    up_response_time_sum FLOAT NOT NULL DEFAULT 0,
+                    packet_loss_sum FLOAT NOT NULL DEFAULT 0,
+                    jitter_sum FLOAT NOT NULL DEFAULT 0,
+                    violation_count INTEGER NOT NULL DEFAULT 0,
+                    anomaly_count INTEGER NOT NULL DEFAULT 0,
+                    rtt_sketch BLOB,
+                    PRIMARY KEY (device_id, bucket_start)
+                )
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_monitoring_rollups_bucket
+                ON monitoring_rollups (bucket_start)
+            ''')
+            # Bumped by every device add/edit/delete so the monitor can tell
+            # when its cached device list is stale with one row read
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS config_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute(
+                "INSERT OR IGNORE INTO config_meta (key, value) VALUES ('device_config_version', 0)"
+            )
+            # Blocks of history moved to the cold archive (see archive.py)
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive_blocks (
+                    device_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    codec TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    sample_count INTEGER NOT NULL,
+                    first_timestamp TIMESTAMP NOT NULL,
+                    last_timestamp TIMESTAMP NOT NULL,
+                    PRIMARY KEY (device_id, day)
+                )
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_archive_blocks_day
+                ON archive_blocks (day)
+            ''')
+        if not has_transitions:
+            self.rebuild_state_transitions()
+        if not has_rollups:
+            self.rebuild_rollups()
+
+    @property
+    def rows_decoded(self):
+        return getattr(self._decoded, 'rows', 0)
+
+    def _count_decoded(self, rows):
+        self._decoded.rows = getattr(self._decoded, 'rows', 0) + rows
+
+    def _add_column(self, table, column, definition):
+        # Runs inside the caller's transaction
+        columns = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _bump_config_version(self):
+        # Runs inside the caller's transaction
+        self.conn.execute(
+            "UPDATE config_meta SET value = value + 1 WHERE key = 'device_config_version'"
+        )
+
+    def get_config_version(self):
+        return self.conn.execute(
+            "SELECT value FROM config_meta WHERE key = 'device_config_version'"
+        ).fetchone()[0]
+
+    def _set_device_tags(self, device_id, tags):
+        # Runs inside the caller's transaction
+        self.conn.execute("DELETE FROM device_tags WHERE device_id = ?", (int(device_id),))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO device_tags (device_id, tag) VALUES (?, ?)",
+            [(int(device_id), tag) for tag in tags if tag]
+        )
+
+    def backup(self, dest_path, pages_per_step=1024, sleep=0.05, progress=None, vacuum=False):
+        """Write a consistent snapshot of the database to dest_path.
+
+        Copies pages_per_step pages at a time through SQLite's online backup
+        API and sleeps `sleep` seconds between steps, so the copy doesn't
+        monopolize the disk while the monitor writes.
+        A dedicated connection holds one read transaction for the whole
+        copy: under WAL that pins the snapshot, so concurrent commits
+        neither block the copy nor force it to restart. vacuum=True uses
+        VACUUM INTO instead, a single step that also compacts the copy.
+        progress(copied_pages, total_pages) is called after each step.
+        Returns the number of pages copied.
+        """
+        dest_path = os.path.abspath(dest_path)
+        tmp_path = dest_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        source = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            total = source.execute("PRAGMA page_count").fetchone()[0]
+            if vacuum:
+                source.execute("COMMIT")  # VACUUM INTO opens its own read transaction
+                source.execute("VACUUM INTO ?", (tmp_path,))
+                if progress:
+                    progress(total, total)
+            else:
+                # Connection.backup's own sleep argument only applies when a
+                # step is busy, so the throttle goes in the per-step callback
+                def step(status, remaining, pages):
+                    if progress:
+                        progress(pages - remaining, pages)
+                    if remaining and sleep:
+                        time.sleep(sleep)
+
+                target = sqlite3.connect(tmp_path)
+                try:
+                    source.backup(target, pages=pages_per_step, progress=step)
+                finally:
+                    target.close()
+                source.execute("ROLLBACK")
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            source.close()
+        os.replace(tmp_path, dest_path)
+        return total
+
+    def _archive_horizon(self):
+        """End of the newest archived sample, or None without an archive"""
+        row = self.conn.execute("SELECT MAX(last_timestamp) FROM archive_blocks").fetchone()
+        return _parse_timestamp(row[0]) if row and row[0] else None
+
+    def rebuild_state_transitions(self, max_gap=None):
+        """Derive the transition log from the raw history (one full scan).
+
+        Transitions up to the archive horizon are kept, since their samples
+        are no longer in monitoring_history. With max_gap (seconds), gaps
+        between samples longer than that get the same unknown-state marker
+        add_monitoring_record logs.
+        """
+        horizon = self._archive_horizon()
+        horizon_text = _format_timestamp(horizon) if horizon else ''
+        with self.conn:
+            self.conn.execute("DELETE FROM device_state_transitions WHERE timestamp > ?", (horizon_text,))
+            self.conn.execute('''
+                WITH samples AS (
+                    SELECT h.device_id, h.status, h.timestamp,
+                        LAG(h.status) OVER w AS previous,
+                        LAG(h.timestamp) OVER w AS previous_time
+                    FROM monitoring_history h
+                    WHERE h.timestamp > :horizon
+                    WINDOW w AS (PARTITION BY h.device_id ORDER BY h.timestamp)
+                ),
+                gaps AS (
+                    SELECT *, previous_time IS NOT NULL AND :max_gap IS NOT NULL
+                        AND (julianday(timestamp) - julianday(previous_time)) * 86400 > :max_gap AS gap
+                    FROM samples
+                )
+                INSERT INTO device_state_transitions (device_id, status, timestamp)
+                SELECT device_id, status, timestamp FROM gaps
+                WHERE CASE
+                    WHEN previous_time IS NULL THEN COALESCE(
+                        (SELECT t.status FROM device_state_transitions t
+                         WHERE t.device_id = gaps.device_id
+                         ORDER BY t.timestamp DESC LIMIT 1) != status, 1)
+                    WHEN gap THEN 1
+                    ELSE previous != status
+                END
+                UNION ALL
+                SELECT device_id, NULL,
+                    strftime('%Y-%m-%d %H:%M:%f', previous_time, '+' || (:max_gap / 2.0) || ' seconds')
+                FROM gaps WHERE gap
+            ''', {'horizon': horizon_text, 'max_gap': max_gap})
+        self._last_status.clear()
+        self._last_sample_at.clear()
+
+    def rebuild_rollups(self, device_id=None, since=None):
+        """Recompute hourly rollups from the raw history.
+
+        Optionally limited to one device and/or buckets starting at or
+        after since (a datetime). Buckets before the archive horizon are
+        never rebuilt, since their samples are no longer in the hot table.
+        """
+        horizon = self._archive_horizon()
+        if horizon is not None:
+            # The bucket holding the horizon is partly archived
+            horizon = horizon.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            since = max(since, horizon) if since is not None else horizon
+        conditions = []
+        params = []
+        if device_id is not None:
+            conditions.append("device_id = ?")
+            params.append(int(device_id))
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since.astimezone(pytz.UTC).strftime(BUCKET_FORMAT))
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        rollup_where = where.replace("timestamp", "bucket_start")
 
-    def add_device(self, ip_address, description, tags, device_type=None, 
-                  response_time_threshold=None, packet_loss_threshold=None, 
-                  jitter_threshold=None):
         with self.conn:
+            self.conn.execute(f"DELETE FROM monitoring_rollups{rollup_where}", params)
+            self.conn.execute(
+                f"""
+                INSERT INTO monitoring_rollups
+                (device_id, bucket_start, sample_count, up_count, response_time_sum,
+                up_response_time_sum, packet_loss_sum, jitter_sum,
+                violation_count, anomaly_count)
+                SELECT device_id, strftime('%Y-%m-%d %H:00:00', timestamp),
+                    COUNT(*), SUM(status), SUM(response_time),
+                    SUM(CASE WHEN status = 1 THEN response_time ELSE 0 END),
+                    SUM(packet_loss), SUM(jitter),
+                    SUM(CASE WHEN {_VIOLATION_SQL} THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN {_ANOMALY_SQL} THEN 1 ELSE 0 END)
+                FROM monitoring_history{where}
+                GROUP BY device_id, strftime('%Y-%m-%d %H:00:00', timestamp)
+                """,
+                params
+            )
+
+            # Sketches are built in one ordered pass over the up samples
             cursor = self.conn.execute(
-                """
-                INSERT INTO devices 
-                (ip_address, description, tags, device_type, 
-                response_time_threshold, packet_loss_threshold, jitter_threshold)
-                VALUES (?, ?, ?, ?, ?, ?, ?) 
+                f"""
+                SELECT device_id, strftime('%Y-%m-%d %H:00:00', timestamp) AS bucket, response_time
+                FROM monitoring_history{where}{' AND' if where else ' WHERE'} status = 1
+                ORDER BY device_id, timestamp
                 """,
-                (ip_address, description, ','.join(tags), device_type,
-                float(response_time_threshold) if response_time_threshold is not None else None,
-                float(packet_loss_threshold) if packet_loss_threshold is not None else None,
-                float(jitter_threshold) if jitter_threshold is not None else None)
+                params
+            )
+            updates = []
+            key = sketch = None
+            for row in cursor:
+                if (row[0], row[1]) != key:
+                    if sketch is not None:
+                        updates.append((sketch.to_bytes(), key[0], key[1]))
+                    key, sketch = (row[0], row[1]), QuantileSketch()
+                sketch.add(row[2])
+            if sketch is not None:
+                updates.append((sketch.to_bytes(), key[0], key[1]))
+            self.conn.executemany(
+                "UPDATE monitoring_rollups SET rtt_sketch = ? WHERE device_id = ? AND bucket_start = ?",
+                updates
+            )
+        self._rollups.clear()
+
+    def _load_rollup(self, device_id, bucket_start):
+        row = self.conn.execute(
+            "SELECT * FROM monitoring_rollups WHERE device_id = ? AND bucket_start = ?",
+            (device_id, bucket_start)
+        ).fetchone()
+        if row is None:
+            return {
+                'bucket_start': bucket_start, 'sample_count': 0, 'up_count': 0,
+                'response_time_sum': 0.0, 'up_response_time_sum': 0.0,
+                'packet_loss_sum': 0.0, 'jitter_sum': 0.0,
+                'violation_count': 0, 'anomaly_count': 0, 'sketch': QuantileSketch(),
+            }
+        rollup = dict(row)
+        sketch_data = rollup.pop('rtt_sketch')
+        rollup['sketch'] = QuantileSketch.from_bytes(sketch_data) if sketch_data else QuantileSketch()
+        return rollup
+
+    def _update_rollup(self, device_id, current_time, response_time, status,
+                       packet_loss, jitter, violations):
+        # Runs inside the caller's transaction
+        bucket_start = current_time.strftime(BUCKET_FORMAT)
+        rollup = self._rollups.get(device_id)
+        if rollup is None or rollup['bucket_start'] != bucket_start:
+            rollup = self._load_rollup(device_id, bucket_start)
+            self._rollups[device_id] = rollup
+
+        rollup['sample_count'] += 1
+        rollup['response_time_sum'] += response_time
+        rollup['packet_loss_sum'] += packet_loss
+        rollup['jitter_sum'] += jitter
+        if status:
+            rollup['up_count'] += 1
+            rollup['up_response_time_sum'] += response_time
+            rollup['sketch'].add(response_time)
+        if any(not v.endswith('_anomaly') for v in violations):
+            rollup['violation_count'] += 1
+        if any(v.endswith('_anomaly') for v in violations):
+            rollup['anomaly_count'] += 1
+
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO monitoring_rollups
+            (device_id, bucket_start, sample_count, up_count, response_time_sum,
+            up_response_time_sum, packet_loss_sum, jitter_sum,
+            violation_count, anomaly_count, rtt_sketch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (device_id, bucket_start, rollup['sample_count'], rollup['up_count'],
+             rollup['response_time_sum'], rollup['up_response_time_sum'],
+             rollup['packet_loss_sum'], rollup['jitter_sum'],
+             rollup['violation_count'], rollup['anomaly_count'],
+             rollup['sketch'].to_bytes() if rollup['sketch'].count else None)
+        )
+
+    def add_device(self, ip_address, description, tags, device_type=None, 
+                  response_time_threshold=None, packet_loss_threshold=None, 
+                  jitter_threshold=None, probe_type='icmp', probe_port=None, probe_target=None):
+        return self.add_devices([{
+            'ip_address': ip_address, 'description': description, 'tags': tags,
+            'device_type': device_type,
+            'response_time_threshold': response_time_threshold,
+            'packet_loss_threshold': packet_loss_threshold,
+            'jitter_threshold': jitter_threshold,
+            'probe_type': probe_type, 'probe_port': probe_port, 'probe_target': probe_target,
+        }], skip_existing=False)[0]
+
+    def add_devices(self, devices, skip_existing=True):
+        """Insert many devices in one transaction.
+
+        devices are dicts with add_device's parameters. Every IP address is
+        checked with validate_ip, and the probe settings with
+        probes.PROBE_TYPES, first; nothing is written if any fails.
+        Addresses already in the database are skipped unless skip_existing
+        is False. Returns the ids of the inserted devices.
+        """
+        invalid = [device.get('ip_address') for device in devices
+                   if not validate_ip(str(device.get('ip_address') or ''))]
+        if invalid:
+            raise ValueError(f"Invalid IP addresses: {', '.join(map(str, invalid[:10]))}")
+        for device in devices:
+            _probe_columns(device)
+
+        existing = set()
+        if skip_existing:
+            existing = {row[0] for row in self.conn.execute("SELECT ip_address FROM devices")}
+        ids = []
+        tag_rows = []
+        with self.conn:
+            for device in devices:
+                if device['ip_address'] in existing:
+                    continue
+                existing.add(device['ip_address'])
+                tags = device.get('tags') or []
+                thresholds = [device.get(field) for field in
+                              ('response_time_threshold', 'packet_loss_threshold', 'jitter_threshold')]
+                cursor = self.conn.execute(
+                    """
+                    INSERT INTO devices
+                    (ip_address, description, tags, device_type,
+                    response_time_threshold, packet_loss_threshold, jitter_threshold,
+                    probe_type, probe_port, probe_target)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (device['ip_address'], device.get('description') or '', ','.join(tags),
+                     device.get('device_type'),
+                     *[float(value) if value is not None else None for value in thresholds],
+                     *_probe_columns(device))
+                )
+                ids.append(cursor.lastrowid)
+                tag_rows.extend((cursor.lastrowid, tag) for tag in tags if tag)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO device_tags (device_id, tag) VALUES (?, ?)", tag_rows
             )
-            return cursor.lastrowid
+            if ids:
+                self._bump_config_version()
+        return ids
+
+    def _device_filters(self, tag=None, device_type=None, search=None):
+        conditions = []
+        params = []
+        if tag is not None:
+            conditions.append("id IN (SELECT device_id FROM device_tags WHERE tag = ?)")
+            params.append(tag)
+        if device_type is not None:
+            conditions.append("device_type = ?")
+            params.append(device_type)
+        if search:
+            conditions.append("(ip_address LIKE ? OR description LIKE ?)")
+            params.extend([f'%{search}%'] * 2)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_devices')
+    def get_devices(self, tag=None, device_type=None, search=None, limit=None, offset=0):
+        where, params = self._device_filters(tag, device_type, search)
+        query = f"SELECT * FROM devices{where} ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([int(limit), int(offset)])
 
-    def get_devices(self):
-        cursor = self.conn.execute("SELECT * FROM devices ORDER BY created_at DESC")
+        cursor = self.conn.execute(query, params)
         devices = []
         for row in cursor:
             device = dict(row)
             # Convert tags string to list
             device['tags'] = device['tags'].split(',') if device['tags'] else []
             devices.append(device)
+        self._count_decoded(len(devices))
         return devices
 
+    def count_devices(self, tag=None, device_type=None, search=None):
+        where, params = self._device_filters(tag, device_type, search)
+        return self.conn.execute(f"SELECT COUNT(*) FROM devices{where}", params).fetchone()[0]
+
     def update_device(self, device_id, ip_address, description, tags, device_type=None,
                      response_time_threshold=None, packet_loss_threshold=None,
-                     jitter_threshold=None):
+                     jitter_threshold=None, probe_type='icmp', probe_port=None, probe_target=None):
+        self.update_devices([{
+            'id': device_id, 'ip_address': ip_address, 'description': description,
+            'tags': tags, 'device_type': device_type,
+            'response_time_threshold': response_time_threshold,
+            'packet_loss_threshold': packet_loss_threshold,
+            'jitter_threshold': jitter_threshold,
+            'probe_type': probe_type, 'probe_port': probe_port, 'probe_target': probe_target,
+        }])
+
+    def update_devices(self, devices):
+        """Write many edited devices in one transaction.
+
+        devices are dicts with 'id' and every column of update_device;
+        missing probe settings reset the device to ICMP.
+        """
+        self.apply_device_changes(devices, [])
+
+    def apply_device_changes(self, updates, delete_ids):
+        """Save edited devices and delete others in a single transaction"""
         with self.conn:
-            self.conn.execute(
-                """
-                UPDATE devices 
-                SET ip_address = ?, description = ?, tags = ?,
-                    device_type = ?, response_time_threshold = ?,
-                    packet_loss_threshold = ?, jitter_threshold = ?
-                WHERE id = ?
-                """,
-                (ip_address, description, ','.join(tags), device_type,
-                 float(response_time_threshold) if response_time_threshold is not None else None,
-                 float(packet_loss_threshold) if packet_loss_threshold is not None else None,
-                 float(jitter_threshold) if jitter_threshold is not None else None,
-                 int(device_id))
-            )
+            self._write_device_updates(updates)
+            self._write_device_deletes(delete_ids)
+            if updates or delete_ids:
+                self._bump_config_version()
+        self._forget_devices(delete_ids)
+
+    def _write_device_updates(self, devices):
+        if not devices:
+            return
+        ids = [int(device['id']) for device in devices]
+        probe_columns = [_probe_columns(device) for device in devices]
+        self.conn.executemany(
+            """
+            UPDATE devices 
+            SET ip_address = ?, description = ?, tags = ?,
+                device_type = ?, response_time_threshold = ?,
+                packet_loss_threshold = ?, jitter_threshold = ?,
+                probe_type = ?, probe_port = ?, probe_target = ?
+            WHERE id = ?
+            """,
+            [(device['ip_address'], device['description'], ','.join(device['tags']),
+              device['device_type'],
+              *[float(device[field]) if device[field] is not None else None
+                for field in ('response_time_threshold', 'packet_loss_threshold', 'jitter_threshold')],
+              *probe, int(device['id']))
+             for device, probe in zip(devices, probe_columns)]
+        )
+        self.conn.executemany("DELETE FROM device_tags WHERE device_id = ?", [(i,) for i in ids])
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO device_tags (device_id, tag) VALUES (?, ?)",
+            [(int(device['id']), tag) for device in devices for tag in device['tags'] if tag]
+        )
+
+    def get_tags(self):
+        """All tags with the number of devices carrying each"""
+        cursor = self.conn.execute(
+            "SELECT tag, COUNT(*) AS device_count FROM device_tags GROUP BY tag ORDER BY tag"
+        )
+        return [dict(row) for row in cursor]
+
+    def get_device_types(self):
+        cursor = self.conn.execute(
+            """
+            SELECT device_type, COUNT(*) AS device_count FROM devices
+            WHERE device_type IS NOT NULL AND device_type != ''
+            GROUP BY device_type ORDER BY device_type
+            """
+        )
+        return [dict(row) for row in cursor]
 
     def delete_device(self, device_id):
-        with self.conn:
-            self.conn.execute("DELETE FROM devices WHERE id = ?", (int(device_id),))
+        self.delete_devices([device_id])
 
+    def delete_devices(self, device_ids):
+        """Delete devices with their tags, history, rollups, transitions and archive index"""
+        self.apply_device_changes([], device_ids)
+
+    def _write_device_deletes(self, device_ids):
+        ids = [(int(device_id),) for device_id in device_ids]
+        for table, column in (('devices', 'id'), ('device_tags', 'device_id'),
+                              ('monitoring_history', 'device_id'),
+                              ('monitoring_rollups', 'device_id'),
+                              ('device_state_transitions', 'device_id'),
+                              ('archive_blocks', 'device_id')):
+            self.conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", ids)
+
+    def _forget_devices(self, device_ids):
+        """Drop the in-memory state and segments kept for deleted devices"""
+        for device_id in map(int, device_ids):
+            self.anomaly_detector.forget(device_id)
+            self._last_status.pop(device_id, None)
+            self._last_sample_at.pop(device_id, None)
+            self._rollups.pop(device_id, None)
+            if self.segments is not None:
+                self.segments.drop_device(device_id)
+
+    def _prime_anomaly_baseline(self, device_id):
+        # Rebuild the baseline from recent samples so a restart does not
+        # blind the detector for a whole warm-up period
+        recent = self.get_device_history(device_id, limit=self.anomaly_detector.warmup * 2)
+        for record in reversed(recent):
+            self.anomaly_detector.update(device_id, record, score=False)
+
+    @timed('network_monitor_db_write_seconds', 'Latency of storing one monitoring sample')
     def add_monitoring_record(self, device_id, response_time, status, min_rtt=-1, max_rtt=-1, 
-                            avg_rtt=-1, jitter=-1, packet_loss=100):
+                            avg_rtt=-1, jitter=-1, packet_loss=100, thresholds=None, max_gap=None):
+        """Store one sample.
+
+        thresholds is the device's threshold columns as a dict; the monitor
+        passes them from its cached device list, other callers can leave
+        it out and they are read from the devices table. Samples for a
+        device that no longer exists are dropped. When the previous
+        sample is more than max_gap seconds old (the monitor was down), an
+        unknown-state marker is logged half a gap after it, so availability
+        doesn't count the gap as the last known state.
+        """
+        if thresholds is None:
+            device = self.conn.execute(
+                """
+                SELECT response_time_threshold, packet_loss_threshold, jitter_threshold
+                FROM devices WHERE id = ?
+                """,
+                (int(device_id),)
+            ).fetchone()
+            thresholds = dict(device) if device else {}
+
         # Check for threshold violations
         violations = []
-        cursor = self.conn.execute("SELECT * FROM devices WHERE id = ?", (int(device_id),))
-        device = cursor.fetchone()
-        
-        if device:
-            if (device['response_time_threshold'] is not None and 
-                float(response_time) > float(device['response_time_threshold'])):
-                violations.append('response_time')
-            
-            if (device['packet_loss_threshold'] is not None and 
-                float(packet_loss) > float(device['packet_loss_threshold'])):
-                violations.append('packet_loss')
-            
-            if (device['jitter_threshold'] is not None and 
-                float(jitter) > float(device['jitter_threshold'])):
-                violations.append('jitter')
+        if (thresholds.get('response_time_threshold') is not None and 
+            float(response_time) > float(thresholds['response_time_threshold'])):
+            violations.append('response_time')
+
+        if (thresholds.get('packet_loss_threshold') is not None and 
+            float(packet_loss) > float(thresholds['packet_loss_threshold'])):
+            violations.append('packet_loss')
+
+        if (thresholds.get('jitter_threshold') is not None and 
+            float(jitter) > float(thresholds['jitter_threshold'])):
+            violations.append('jitter')
+
+        # Flag unusual shifts against the device's streaming baseline
+        if not self.anomaly_detector.knows(int(device_id)):
+            self._prime_anomaly_baseline(int(device_id))
+        anomalies = self.anomaly_detector.update(int(device_id), {
+            'response_time': float(response_time),
+            'jitter': float(jitter),
+            'packet_loss': float(packet_loss),
+        })
+        if anomalies:
+            ANOMALIES.inc(len(anomalies))
+            violations.extend(anomalies)
 
         # Get current UTC timestamp
         current_time = datetime.now(pytz.UTC)
+        timestamp = current_time.strftime(TIMESTAMP_FORMAT)
+        status = 1 if status else 0
+
+        device_id = int(device_id)
+        if device_id not in self._last_status:
+            row = self.conn.execute(
+                """
+                SELECT status FROM device_state_transitions
+                WHERE device_id = ? ORDER BY timestamp DESC LIMIT 1
+                """,
+                (device_id,)
+            ).fetchone()
+            self._last_status[device_id] = row['status'] if row else None
+        if device_id not in self._last_sample_at:
+            self._last_sample_at[device_id] = self._last_sample_time(device_id)
+        previous_sample = self._last_sample_at[device_id]
         
+        try:
+            with self.conn:
+                # Take the write lock before checking, so a delete from the
+                # dashboard can't land between the check and the writes
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self.conn.execute("SELECT 1 FROM devices WHERE id = ?", (device_id,)).fetchone() is None:
+                    # Deleted since the monitor loaded its device list; don't
+                    # recreate rollups, transitions or segments for it
+                    self._forget_devices([device_id])
+                    return
+                if (max_gap and previous_sample is not None and self._last_status[device_id] is not None
+                        and (current_time - previous_sample).total_seconds() > max_gap):
+                    self.conn.execute(
+                        """
+                        INSERT INTO device_state_transitions (device_id, status, timestamp)
+                        VALUES (?, NULL, ?)
+                        """,
+                        (device_id, _format_timestamp(previous_sample + timedelta(seconds=max_gap / 2)))
+                    )
+                    self._last_status[device_id] = None
+                if self.segments is None:
+                    self.conn.execute(
+                        """
+                        INSERT INTO monitoring_history 
+                        (device_id, response_time, status, min_rtt, max_rtt, 
+                        avg_rtt, jitter, packet_loss, threshold_violations, timestamp)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (device_id, float(response_time), status,
+                        float(min_rtt), float(max_rtt), float(avg_rtt),
+                        float(jitter), float(packet_loss),
+                        ','.join(violations) if violations else None,
+                        timestamp)
+                    )
+                if self._last_status[device_id] != status:
+                    self.conn.execute(
+                        """
+                        INSERT INTO device_state_transitions (device_id, status, timestamp)
+                        VALUES (?, ?, ?)
+                        """,
+                        (device_id, status, timestamp)
+                    )
+                self._update_rollup(device_id, current_time, float(response_time), status,
+                                    float(packet_loss), float(jitter), violations)
+        except Exception:
+            # The in-memory rollup may be ahead of the rolled-back row
+            self._rollups.pop(device_id, None)
+            self._last_status.pop(device_id, None)
+            raise
+        self._last_status[device_id] = status
+        self._last_sample_at[device_id] = current_time
+        # Only once the transaction has committed, so a rollback never
+        # leaves a segment row behind
+        if self.segments is not None:
+            self.segments.append(
+                device_id, current_time, float(response_time), status,
+                float(min_rtt), float(max_rtt), float(avg_rtt),
+                float(jitter), float(packet_loss), violations
+            )
+
+    def mark_monitoring_stopped(self, timestamp=None):
+        """Log an unknown state for every device from timestamp (now) on.
+
+        Called when the monitor stops, so the time until it runs again is
+        left out of availability instead of counted as the last state.
+        """
+        timestamp = timestamp or datetime.now(pytz.UTC)
         with self.conn:
             self.conn.execute(
                 """
-                INSERT INTO monitoring_history 
-                (device_id, response_time, status, min_rtt, max_rtt, 
-                avg_rtt, jitter, packet_loss, threshold_violations, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO device_state_transitions (device_id, status, timestamp)
+                SELECT d.id, NULL, ? FROM devices d
+                WHERE (SELECT t.status FROM device_state_transitions t
+                       WHERE t.device_id = d.id
+                       ORDER BY t.timestamp DESC LIMIT 1) IS NOT NULL
                 """,
-                (int(device_id), float(response_time), 1 if status else 0,
-                float(min_rtt), float(max_rtt), float(avg_rtt),
-                float(jitter), float(packet_loss),
-                ','.join(violations) if violations else None,
-                current_time.strftime('%Y-%m-%d %H:%M:%S.%f'))
+                (_format_timestamp(timestamp),)
             )
+        self._last_status.clear()
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_device_history')
+    def get_device_history(self, device_id, limit=100, start=None, end=None):
+        """Samples newest first, optionally only those in [start, end).
+
+        Archived days are read only when the hot store runs out before
+        limit and the window reaches back into the archive.
+        """
+        history = self._get_hot_history(device_id, limit, start, end)
+        if limit is None or len(history) < limit:
+            # Older samples may have been moved to the cold archive
+            history.extend(self._get_archived_history(
+                device_id, None if limit is None else limit - len(history),
+                history[-1]['timestamp'] if history else end, start
+            ))
+        return history
+
+    def _get_archived_history(self, device_id, limit, before=None, start=None):
+        cursor = self.conn.execute(
+            """
+            SELECT path, codec, offset, length FROM archive_blocks
+            WHERE device_id = ? AND first_timestamp < ? AND last_timestamp >= ?
+            ORDER BY day DESC
+            """,
+            (int(device_id), _format_timestamp(before) if before else '9999',
+             _format_timestamp(start) if start else '0000')
+        )
+        history = []
+        for row in cursor.fetchall():
+            columns = archive.read_block(row['path'], row['offset'], row['length'], row['codec'])
+            self._count_decoded(len(columns['ts']))
+            if before is not None or start is not None:
+                # Block timestamps ascend, so the first and last bound an open side
+                ts = columns['ts']
+                low = archive.to_micros(start) if start is not None else ts[0]
+                high = archive.to_micros(before) if before is not None else ts[-1] + 1
+                keep = (ts >= low) & (ts < high)
+                columns = {name: values[keep] for name, values in columns.items()}
+            records = archive.block_records(device_id, columns)
+            history.extend(records if limit is None else records[:limit - len(history)])
+            if limit is not None and len(history) >= limit:
+                break
+        return history
+
+    def _get_hot_history(self, device_id, limit, start=None, end=None):
+        if self.segments is not None:
+            history = self.segments.get_history(int(device_id), limit=limit, start=start, end=end)
+            self._count_decoded(len(history))
+            return history
 
-    def get_device_history(self, device_id, limit=100):
         query = """
             SELECT * FROM monitoring_history 
             WHERE device_id = ? 
-            ORDER BY timestamp DESC
         """
         params = [int(device_id)]
+        if start is not None:
+            query += " AND timestamp >= ?"
+            params.append(_format_timestamp(start))
+        if end is not None:
+            query += " AND timestamp < ?"
+            params.append(_format_timestamp(end))
+        query += " ORDER BY timestamp DESC"
         
         if limit is not None:
             query += " LIMIT ?"
@@ -159,34 +919,27 @@ class Database:
             # Ensure numeric fields are float
             for field in ['response_time', 'min_rtt', 'max_rtt', 'avg_rtt', 'jitter', 'packet_loss']:
                 record[field] = float(record[field])
-            try:
-                # Try parsing with microseconds
-                record['timestamp'] = datetime.strptime(
-                    record['timestamp'], '%Y-%m-%d %H:%M:%S.%f'
-                ).replace(tzinfo=pytz.UTC)
-            except ValueError:
-                # Fall back to parsing without microseconds
-                record['timestamp'] = datetime.strptime(
-                    record['timestamp'], '%Y-%m-%d %H:%M:%S'
-                ).replace(tzinfo=pytz.UTC)
+            record['timestamp'] = _parse_timestamp(record['timestamp'])
             history.append(record)
+        self._count_decoded(len(history))
         return history
 
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_device_trends')
     def get_device_trends(self, device_id, hours=24):
+        # Served from the hourly rollups; the oldest bucket is included whole
         cursor = self.conn.execute(
             """
             SELECT 
-                strftime('%Y-%m-%d %H:00:00', timestamp) as time_bucket,
-                AVG(response_time) as avg_response_time,
-                AVG(packet_loss) as avg_packet_loss,
-                AVG(jitter) as avg_jitter,
-                CAST(SUM(CASE WHEN status = 1 THEN 1 ELSE 0 END) AS FLOAT) / 
-                CAST(COUNT(*) AS FLOAT) * 100 as availability
-            FROM monitoring_history 
+                bucket_start as time_bucket,
+                response_time_sum / sample_count as avg_response_time,
+                packet_loss_sum / sample_count as avg_packet_loss,
+                jitter_sum / sample_count as avg_jitter,
+                CAST(up_count AS FLOAT) / CAST(sample_count AS FLOAT) * 100 as availability,
+                rtt_sketch
+            FROM monitoring_rollups 
             WHERE device_id = ? 
-            AND timestamp >= datetime('now', ?)
-            GROUP BY time_bucket
-            ORDER BY time_bucket DESC
+            AND bucket_start >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+            ORDER BY bucket_start DESC
             """,
             (int(device_id), f'-{int(hours)} hours')
         )
@@ -197,5 +950,429 @@ class Database:
             trend['time_bucket'] = datetime.strptime(
                 trend['time_bucket'], '%Y-%m-%d %H:%M:%S'
             ).replace(tzinfo=pytz.UTC)
+            sketch_data = trend.pop('rtt_sketch')
+            sketch = QuantileSketch.from_bytes(sketch_data) if sketch_data else None
+            trend['p95_response_time'] = sketch.quantile(0.95) if sketch else None
+            trend['p99_response_time'] = sketch.quantile(0.99) if sketch else None
             trends.append(trend)
+        self._count_decoded(len(trends))
         return trends
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_response_time_percentiles')
+    def get_response_time_percentiles(self, device_id, hours=24, quantiles=(0.5, 0.95, 0.99),
+                                      start=None, end=None):
+        """Response-time percentiles over a window, from merged hourly sketches.
+
+        Accurate to within sketches.DEFAULT_RELATIVE_ACCURACY (1%) of the
+        exact value; the window is widened to whole hours.
+        """
+        end = end or datetime.now(pytz.UTC)
+        start = start or end - timedelta(hours=hours)
+        cursor = self.conn.execute(
+            """
+            SELECT rtt_sketch FROM monitoring_rollups
+            WHERE device_id = ? AND bucket_start >= ? AND bucket_start <= ?
+            AND rtt_sketch IS NOT NULL
+            """,
+            (int(device_id), start.astimezone(pytz.UTC).strftime(BUCKET_FORMAT),
+             _format_timestamp(end))
+        )
+        sketch = QuantileSketch()
+        merged = 0
+        for row in cursor:
+            sketch.merge_bytes(row['rtt_sketch'])
+            merged += 1
+        self._count_decoded(merged)
+        return {q: sketch.quantile(q) for q in quantiles}
+
+    def _last_sample_time(self, device_id):
+        if self.segments is not None:
+            last_sample = self.segments.last_timestamp(device_id)
+            if last_sample is not None:
+                return last_sample
+        else:
+            last_sample = self.conn.execute(
+                "SELECT MAX(timestamp) AS timestamp FROM monitoring_history WHERE device_id = ?",
+                (device_id,)
+            ).fetchone()['timestamp']
+            if last_sample is not None:
+                return _parse_timestamp(last_sample)
+        last_sample = self.conn.execute(
+            "SELECT MAX(last_timestamp) AS timestamp FROM archive_blocks WHERE device_id = ?",
+            (device_id,)
+        ).fetchone()['timestamp']
+        return _parse_timestamp(last_sample) if last_sample is not None else None
+
+    def get_oldest_history_time(self):
+        """Timestamp of the oldest row in monitoring_history, or None"""
+        # One seek per device on (device_id, timestamp) rather than a table scan
+        oldest = self.conn.execute(
+            "SELECT MIN(first) FROM (SELECT MIN(timestamp) AS first FROM monitoring_history GROUP BY device_id)"
+        ).fetchone()[0]
+        return _parse_timestamp(oldest) if oldest is not None else None
+
+    def archive_history_day(self, day, archive_dir, codec):
+        """Move one UTC day of monitoring_history into a compressed day file.
+
+        Returns the number of rows moved. Samples that arrive for a day
+        already archived are merged into its file on the next run.
+        """
+        day_name = day.strftime(archive.DAY_FORMAT)
+        day_start = _format_timestamp(day)
+        day_end = _format_timestamp(day + timedelta(days=1))
+        device_ids = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT device_id FROM monitoring_history WHERE timestamp >= ? AND timestamp < ?",
+            (day_start, day_end)
+        )]
+        if not device_ids:
+            return 0
+
+        existing = {row['device_id']: row for row in self.conn.execute(
+            "SELECT * FROM archive_blocks WHERE day = ?", (day_name,)
+        ).fetchall()}
+        blocks = []
+        moved = 0
+        for device_id in device_ids:
+            rows = self.conn.execute(
+                """
+                SELECT timestamp, response_time, min_rtt, max_rtt, avg_rtt, jitter,
+                    packet_loss, status, threshold_violations
+                FROM monitoring_history
+                WHERE device_id = ? AND timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp
+                """,
+                (device_id, day_start, day_end)
+            ).fetchall()
+            columns = {
+                'ts': [archive.to_micros(_parse_timestamp(row[0])) for row in rows],
+                'status': [1 if row[7] else 0 for row in rows],
+                'flags': [encode_flags(row[8].split(',') if row[8] else []) for row in rows],
+            }
+            for index, name in enumerate(METRIC_COLUMNS, start=1):
+                columns[name] = [row[index] for row in rows]
+            if device_id in existing:
+                block = existing.pop(device_id)
+                previous = archive.read_block(block['path'], block['offset'], block['length'], block['codec'])
+                columns = archive.merge_columns(previous, columns)
+            blocks.append((device_id, columns))
+            moved += len(rows)
+        # Devices archived on an earlier run with nothing new are carried over
+        for device_id, block in existing.items():
+            blocks.append((device_id, archive.read_block(block['path'], block['offset'],
+                                                         block['length'], block['codec'])))
+
+        # Each run writes a new file, complete on disk before any row is
+        # deleted; if the process dies in between, the old index still
+        # points at the old file and the next run simply redoes the day
+        path = archive.day_file_path(archive_dir, day, codec)
+        old_paths = {row['path'] for row in self.conn.execute(
+            "SELECT DISTINCT path FROM archive_blocks WHERE day = ?", (day_name,)
+        )}
+        index = archive.write_day_file(path, blocks, codec)
+        with self.conn:
+            self.conn.execute("DELETE FROM archive_blocks WHERE day = ?", (day_name,))
+            self.conn.executemany(
+                """
+                INSERT INTO archive_blocks
+                (device_id, day, path, codec, offset, length, sample_count,
+                first_timestamp, last_timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(device_id, day_name, path, codec, offset, length, count,
+                  _format_timestamp(archive.from_micros(first)),
+                  _format_timestamp(archive.from_micros(last)))
+                 for device_id, offset, length, count, first, last in index]
+            )
+            self.conn.executemany(
+                "DELETE FROM monitoring_history WHERE device_id = ? AND timestamp >= ? AND timestamp < ?",
+                [(device_id, day_start, day_end) for device_id in device_ids]
+            )
+        for old_path in old_paths:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        return moved
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_device_columns')
+    def get_device_columns(self, device_id, hours=24, start=None, end=None):
+        """Raw samples in a window as column arrays, oldest first.
+
+        Returns a list of (partition_start, {column: numpy array}) chunks
+        where 'ts' is milliseconds since partition_start. With the segment
+        engine the arrays are zero-copy memory-mapped views; otherwise the
+        window is read from SQLite into a single chunk.
+        """
+        import numpy as np
+
+        end = end or datetime.now(pytz.UTC)
+        start = start or end - timedelta(hours=hours)
+        chunks = self._get_archived_columns(device_id, start, end)
+        if self.segments is not None:
+            return chunks + list(self.segments.iter_partitions(int(device_id), start, end))
+
+        cursor = self.conn.execute(
+            """
+            SELECT timestamp, response_time, min_rtt, max_rtt, avg_rtt, jitter,
+                packet_loss, status, threshold_violations
+            FROM monitoring_history
+            WHERE device_id = ? AND timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp
+            """,
+            (int(device_id), _format_timestamp(start), _format_timestamp(end))
+        )
+        rows = cursor.fetchall()
+        self._count_decoded(len(rows))
+        if not rows:
+            return chunks
+        columns = {name: [] for name, _ in SEGMENT_COLUMNS}
+        for row in rows:
+            columns['ts'].append((_parse_timestamp(row[0]) - start).total_seconds() * 1000)
+            for name, value in zip(('response_time', 'min_rtt', 'max_rtt', 'avg_rtt', 'jitter', 'packet_loss'), row[1:7]):
+                columns[name].append(value)
+            columns['status'].append(row[7])
+            columns['flags'].append(encode_flags(row[8].split(',') if row[8] else []))
+        return chunks + [(start, {
+            name: np.asarray(columns[name], dtype='<f8' if name == 'ts' else dtype)
+            for name, dtype in SEGMENT_COLUMNS
+        })]
+
+    def _get_archived_columns(self, device_id, start, end):
+        cursor = self.conn.execute(
+            """
+            SELECT path, codec, offset, length FROM archive_blocks
+            WHERE device_id = ? AND last_timestamp >= ? AND first_timestamp < ?
+            ORDER BY day
+            """,
+            (int(device_id), _format_timestamp(start), _format_timestamp(end))
+        )
+        chunks = []
+        low, high = archive.to_micros(start), archive.to_micros(end)
+        for row in cursor.fetchall():
+            columns = archive.read_block(row['path'], row['offset'], row['length'], row['codec'])
+            self._count_decoded(len(columns['ts']))
+            keep = (columns['ts'] >= low) & (columns['ts'] < high)
+            columns = {name: values[keep] for name, values in columns.items()}
+            # Same shape as the other engines: 'ts' in milliseconds since the chunk start
+            columns['ts'] = (columns['ts'] - low) / 1000.0
+            if len(columns['ts']):
+                chunks.append((start, columns))
+        return chunks
+
+    def copy_history_to_segments(self, batch_size=100000, progress=None):
+        """Import every monitoring_history row into the segment store.
+
+        Rows are read in (device_id, timestamp) order and appended in
+        column batches. Returns the number of rows copied.
+        """
+        if self.segments is None:
+            raise ValueError("No segment directory configured")
+        cursor = self.conn.execute(
+            """
+            SELECT device_id, timestamp, response_time, min_rtt, max_rtt, avg_rtt,
+                jitter, packet_loss, status, threshold_violations
+            FROM monitoring_history
+            ORDER BY device_id, timestamp
+            """
+        )
+        copied = 0
+        device_id = batch = None
+
+        def flush():
+            if batch and batch['ts']:
+                self.segments.append_many(device_id, batch)
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if row[0] != device_id:
+                    flush()
+                    device_id = row[0]
+                    batch = {name: [] for name, _ in SEGMENT_COLUMNS}
+                batch['ts'].append(_parse_timestamp(row[1]))
+                for name, value in zip(('response_time', 'min_rtt', 'max_rtt', 'avg_rtt', 'jitter', 'packet_loss'), row[2:8]):
+                    batch[name].append(value)
+                batch['status'].append(1 if row[8] else 0)
+                batch['flags'].append(encode_flags(row[9].split(',') if row[9] else []))
+            flush()
+            batch = {name: [] for name, _ in SEGMENT_COLUMNS}
+            copied += len(rows)
+            if progress:
+                progress(copied)
+        return copied
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_availability')
+    def get_availability(self, device_id, hours=24, start=None, end=None):
+        """Availability, outage count, MTTR and longest outage over a window.
+
+        Reads only the state-transition log: the state at the window start
+        is one index seek, then just the transitions inside the window.
+        """
+        end = end or datetime.now(pytz.UTC)
+        start = start or end - timedelta(hours=hours)
+        device_id = int(device_id)
+
+        initial = self.conn.execute(
+            """
+            SELECT status FROM device_state_transitions
+            WHERE device_id = ? AND timestamp <= ?
+            ORDER BY timestamp DESC LIMIT 1
+            """,
+            (device_id, _format_timestamp(start))
+        ).fetchone()
+        cursor = self.conn.execute(
+            """
+            SELECT status, timestamp FROM device_state_transitions
+            WHERE device_id = ? AND timestamp > ? AND timestamp <= ?
+            ORDER BY timestamp
+            """,
+            (device_id, _format_timestamp(start), _format_timestamp(end))
+        )
+        # NULL status marks time the monitor wasn't running
+        transitions = [(None if row['status'] is None else bool(row['status']), _parse_timestamp(row['timestamp']))
+                       for row in cursor]
+        self._count_decoded(len(transitions) + (initial is not None))
+
+        # Nothing is known after the newest sample, so stop counting there
+        last_sample = self._last_sample_time(device_id)
+        if last_sample is not None:
+            end = min(end, last_sample)
+
+        return summarize_availability(
+            bool(initial['status']) if initial and initial['status'] is not None else None,
+            transitions, start, end
+        )
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_fleet_aggregates')
+    def get_fleet_aggregates(self, group_by='tag', hours=24):
+        """Availability, RTT and violation counts per tag or device type.
+
+        One grouped query over the hourly rollups in the window; p95 RTT
+        comes from merging each group's response-time sketches (within 1%).
+        """
+        if group_by == 'tag':
+            groups = "SELECT device_id, tag AS grp FROM device_tags"
+        elif group_by == 'device_type':
+            groups = "SELECT id AS device_id, COALESCE(NULLIF(device_type, ''), 'Unspecified') AS grp FROM devices"
+        else:
+            raise ValueError(f"Cannot group devices by {group_by!r}")
+
+        since = (datetime.now(pytz.UTC) - timedelta(hours=hours)).strftime(BUCKET_FORMAT)
+        cursor = self.conn.execute(
+            f"""
+            SELECT
+                g.grp AS name,
+                COUNT(DISTINCT r.device_id) AS devices,
+                SUM(r.sample_count) AS samples,
+                CAST(SUM(r.up_count) AS FLOAT) / SUM(r.sample_count) * 100 AS availability,
+                SUM(r.up_response_time_sum) / NULLIF(SUM(r.up_count), 0) AS avg_rtt,
+                SUM(r.violation_count) AS violations,
+                SUM(r.anomaly_count) AS anomalies
+            FROM monitoring_rollups r
+            JOIN ({groups}) g ON g.device_id = r.device_id
+            WHERE r.bucket_start >= ?
+            GROUP BY g.grp
+            ORDER BY g.grp
+            """,
+            (since,)
+        )
+        aggregates = [dict(row) for row in cursor]
+        merged = 0
+
+        # Merge the sketches of every group in a single pass
+        sketches = {}
+        cursor = self.conn.execute(
+            f"""
+            SELECT g.grp, r.rtt_sketch
+            FROM monitoring_rollups r
+            JOIN ({groups}) g ON g.device_id = r.device_id
+            WHERE r.bucket_start >= ? AND r.rtt_sketch IS NOT NULL
+            """,
+            (since,)
+        )
+        for grp, sketch_data in cursor:
+            sketches.setdefault(grp, QuantileSketch()).merge_bytes(sketch_data)
+            merged += 1
+        self._count_decoded(len(aggregates) + merged)
+        for aggregate in aggregates:
+            sketch = sketches.get(aggregate['name'])
+            aggregate['p95_rtt'] = sketch.quantile(0.95) if sketch else None
+        return aggregates
+
+    @timed('network_monitor_db_query_seconds', 'Database query latency', method='get_comparison_series')
+    def get_comparison_series(self, device_ids=None, tag=None, hours=24, max_points=200):
+        """Time-bucketed RTT, loss and availability for several devices at once.
+
+        Pass device_ids, or a tag to compare every device carrying it. One
+        grouped query with device_id IN (...) does the bucketing, so each
+        device gets at most about max_points points whatever the window.
+        Windows long enough for hourly buckets to give at least a quarter
+        of max_points are summed from the hourly rollups; shorter ones are
+        bucketed from raw history, except with the segment engine, which
+        leaves only the rollups in SQLite.
+
+        Returns {'bucket_seconds', 'source', 'series'} where series maps
+        device id to points (oldest first) with time_bucket, samples,
+        avg_response_time (up samples only), avg_packet_loss and availability.
+        """
+        if tag is not None:
+            devices_sql, params = "SELECT device_id FROM device_tags WHERE tag = ?", [tag]
+        else:
+            device_ids = [int(device_id) for device_id in device_ids or []]
+            if not device_ids:
+                return {'bucket_seconds': None, 'source': None, 'series': {}}
+            devices_sql, params = ', '.join('?' * len(device_ids)), device_ids
+
+        span = int(hours * 3600)
+        max_points = max(1, int(max_points))
+        bucket_seconds = -(-span // max_points)
+        if span >= 3600 * max_points // 4 or self.segments is not None:
+            # Whole hours, so every rollup falls in exactly one bucket
+            bucket_seconds = max(1, -(-bucket_seconds // 3600)) * 3600
+            source = 'rollups'
+            query = f"""
+                SELECT
+                    device_id,
+                    CAST(strftime('%s', bucket_start) AS INTEGER) / ? * ? AS bucket,
+                    SUM(sample_count) AS samples,
+                    SUM(up_response_time_sum) / NULLIF(SUM(up_count), 0) AS avg_response_time,
+                    SUM(packet_loss_sum) / SUM(sample_count) AS avg_packet_loss,
+                    CAST(SUM(up_count) AS FLOAT) / SUM(sample_count) * 100 AS availability
+                FROM monitoring_rollups
+                WHERE device_id IN ({devices_sql}) AND bucket_start >= ? AND sample_count > 0
+                GROUP BY device_id, bucket
+                ORDER BY device_id, bucket
+            """
+        else:
+            bucket_seconds = max(60, -(-bucket_seconds // 60) * 60)
+            source = 'history'
+            query = f"""
+                SELECT
+                    device_id,
+                    CAST(strftime('%s', timestamp) AS INTEGER) / ? * ? AS bucket,
+                    COUNT(*) AS samples,
+                    AVG(CASE WHEN status THEN response_time END) AS avg_response_time,
+                    AVG(packet_loss) AS avg_packet_loss,
+                    CAST(SUM(status) AS FLOAT) / COUNT(*) * 100 AS availability
+                FROM monitoring_history
+                WHERE device_id IN ({devices_sql}) AND timestamp >= ?
+                GROUP BY device_id, bucket
+                ORDER BY device_id, bucket
+            """
+
+        since = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        # Start on a bucket boundary so the first bucket isn't a partial one
+        since = datetime.fromtimestamp(int(since.timestamp()) // bucket_seconds * bucket_seconds, pytz.UTC)
+        since = since.strftime(BUCKET_FORMAT) if source == 'rollups' else _format_timestamp(since)
+        cursor = self.conn.execute(query, [bucket_seconds, bucket_seconds, *params, since])
+
+        series = {}
+        rows = 0
+        for row in cursor:
+            point = dict(row)
+            device_id = point.pop('device_id')
+            point['time_bucket'] = datetime.fromtimestamp(point.pop('bucket'), pytz.UTC)
+            series.setdefault(device_id, []).append(point)
+            rows += 1
+        self._count_decoded(rows)
+        return {'bucket_seconds': bucket_seconds, 'source': source, 'series': series}
@@ -0,0 +1,205 @@
+"""Subnet discovery and bulk device inventory import.
+
+discover() sweeps CIDR ranges with a pool of worker threads sharing a
+token-bucket rate limit, so a /16 is covered in minutes without flooding
+the network. load_inventory() reads devices from a CSV or YAML file; YAML
+needs the optional PyYAML package. Both produce device dicts ready for
+Database.add_devices.
+
+    hosts = discover(['10.20.0.0/16'], rate=500, workers=256)
+    database.add_devices([device_from_host(h['ip_address']) for h in hosts if h['alive']])
+"""
+import csv
+import io
+import ipaddress
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from probes import PROBE_TYPES, Ping3Backend
+from utils import validate_ip
+
+try:
+    import yaml
+except ImportError:  # Optional, only needed for YAML inventories
+    yaml = None
+
+DEFAULT_RATE = 500       # probes per second
+DEFAULT_WORKERS = 256
+DEFAULT_TIMEOUT = 1.0
+# Refuse to expand anything larger than a /16 by accident
+MAX_HOSTS = 65536
+
+# Same defaults as the "Add New Device" form
+DEFAULT_THRESHOLDS = {
+    'response_time_threshold': 1.0,
+    'packet_loss_threshold': 5.0,
+    'jitter_threshold': 0.1,
+}
+
+class RateLimiter:
+    """Token bucket shared by all workers; acquire() blocks until a probe may start"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate / 10))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def expand_targets(cidrs, max_hosts=MAX_HOSTS):
+    """Unique host addresses in the given CIDRs or single IPs, in order"""
+    seen = set()
+    hosts = []
+    for cidr in cidrs:
+        cidr = cidr.strip()
+        if not cidr:
+            continue
+        try:
+            network = ipaddress.ip_network(cidr, strict=False)
+        except ValueError:
+            raise ValueError(f"Invalid network: {cidr}")
+        if network.version != 4:
+            raise ValueError(f"Only IPv4 networks are supported: {cidr}")
+        # hosts() skips the network and broadcast addresses, except for /31 and /32
+        addresses = network.hosts() if network.num_addresses > 2 else iter(network)
+        if len(seen) + network.num_addresses > max_hosts + 2:
+            raise ValueError(f"More than {max_hosts} addresses requested")
+        for address in addresses:
+            address = str(address)
+            if address not in seen:
+                seen.add(address)
+                hosts.append(address)
+    return hosts
+
+def discover(targets, backend=None, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS,
+             timeout=DEFAULT_TIMEOUT, attempts=1, progress=None, stop_event=None):
+    """Probe every target address concurrently.
+
+    Returns one {'ip_address', 'alive', 'response_time'} dict per target, in
+    target order. progress(done, total) is called from the calling thread
+    as probes complete; setting stop_event marks the remaining targets as
+    not alive without probing them.
+    """
+    if backend is None:
+        backend = Ping3Backend()
+    limiter = RateLimiter(rate)
+    # Also set on the way out, so queued probes are skipped when the caller
+    # is interrupted (e.g. a Streamlit rerun raising inside progress)
+    stop_event = stop_event or threading.Event()
+
+    def probe(ip_address):
+        for _ in range(attempts):
+            if stop_event is not None and stop_event.is_set():
+                return None
+            limiter.acquire()
+            try:
+                reply = backend.ping(ip_address, timeout=timeout)
+            except Exception:
+                reply = None
+            # ping3 returns False for unresolvable or unreachable hosts
+            if reply not in (None, False):
+                return reply
+        return None
+
+    results = [None] * len(targets)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets) or 1)))
+    try:
+        futures = {pool.submit(probe, ip_address): index for index, ip_address in enumerate(targets)}
+        # Progress is reported from the calling thread, so Streamlit widgets can be updated
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            response_time = future.result()
+            results[index] = {
+                'ip_address': targets[index],
+                'alive': response_time is not None,
+                'response_time': response_time,
+            }
+            if progress:
+                progress(done, len(targets))
+    finally:
+        stop_event.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+def device_from_host(ip_address, description='', tags=None, device_type='Other', **thresholds):
+    device = {
+        'ip_address': ip_address,
+        'description': description or f'Discovered {ip_address}',
+        'tags': list(tags or ['discovered']),
+        'device_type': device_type,
+    }
+    device.update(DEFAULT_THRESHOLDS)
+    device.update(thresholds)
+    return device
+
+def _parse_tags(value):
+    if isinstance(value, (list, tuple)):
+        return [str(tag).strip() for tag in value if str(tag).strip()]
+    return [tag.strip() for tag in str(value or '').split(',') if tag.strip()]
+
+def parse_inventory(records):
+    """Validate raw inventory rows; returns (devices, errors) with 1-based row numbers in errors"""
+    devices = []
+    errors = []
+    for number, record in enumerate(records, start=1):
+        record = {str(key).strip().lower(): value for key, value in (record or {}).items() if key is not None}
+        ip_address = str(record.get('ip_address') or record.get('ip') or '').strip()
+        if not validate_ip(ip_address):
+            errors.append(f"Row {number}: invalid IP address {ip_address!r}")
+            continue
+        device = device_from_host(
+            ip_address,
+            description=str(record.get('description') or ip_address),
+            tags=_parse_tags(record.get('tags')) if record.get('tags') not in (None, '') else None,
+            device_type=str(record.get('device_type') or 'Other'),
+        )
+        try:
+            for field in DEFAULT_THRESHOLDS:
+                if record.get(field) not in (None, ''):
+                    device[field] = float(record[field])
+        except (TypeError, ValueError):
+            errors.append(f"Row {number}: thresholds must be numbers")
+            continue
+        probe_type = str(record.get('probe_type') or 'icmp').strip().lower()
+        if probe_type not in PROBE_TYPES:
+            errors.append(f"Row {number}: probe_type must be one of {', '.join(PROBE_TYPES)}")
+            continue
+        try:
+            probe_port = int(record['probe_port']) if record.get('probe_port') not in (None, '') else None
+        except (TypeError, ValueError):
+            errors.append(f"Row {number}: probe_port must be a number")
+            continue
+        device.update(probe_type=probe_type, probe_port=probe_port,
+                      probe_target=str(record.get('probe_target') or '').strip() or None)
+        devices.append(device)
+    return devices, errors
+
+def load_inventory(data, fmt):
+    """Parse a CSV or YAML inventory (text or bytes); returns (devices, errors)"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if fmt == 'csv':
+        return parse_inventory(csv.DictReader(io.StringIO(data)))
+    if fmt in ('yaml', 'yml'):
+        if yaml is None:
+            raise RuntimeError("Install PyYAML to import YAML inventories")
+        loaded = yaml.safe_load(data) or []
+        if isinstance(loaded, dict):
+            loaded = loaded.get('devices', [])
+        if not isinstance(loaded, list):
+            raise ValueError("A YAML inventory must be a list of devices or have a 'devices' list")
+        return parse_inventory(item if isinstance(item, dict) else {'ip_address': item} for item in loaded)
+    raise ValueError(f"Unsupported inventory format: {fmt}")
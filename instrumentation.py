@@ -0,0 +1,197 @@
+"""In-process counters, gauges and latency histograms for the monitor itself.
+
+Recording a sample is a perf_counter() pair, a bisect over a short bucket
+tuple and a couple of additions under an uncontended lock (around a
+microsecond), cheap enough to leave on around every ping and every query.
+The daemon exposes the registry in Prometheus text format on /metrics.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds in seconds, spanning sub-millisecond SQLite calls up to
+# multi-minute sweeps
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(f'{name}_total{_format_labels(labels)}', self.value)]
+
+    def snapshot(self):
+        return {'value': self.value}
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self, name, labels):
+        return [(f'{name}{_format_labels(labels)}', self.value)]
+
+    def snapshot(self):
+        return {'value': self.value}
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        # One extra slot for observations above the largest bound (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.last = None
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+            self.last = value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the matching bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for idx, bucket_count in enumerate(self.counts):
+            upper = self.buckets[idx] if idx < len(self.buckets) else math.inf
+            if bucket_count and cumulative + bucket_count >= rank:
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = upper
+        return lower
+
+    def samples(self, name, labels):
+        result = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            result.append((f'{name}_bucket{_format_labels(labels, ("le", repr(float(bound))))}', cumulative))
+        result.append((f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))}', self.count))
+        result.append((f'{name}_sum{_format_labels(labels)}', self.sum))
+        result.append((f'{name}_count{_format_labels(labels)}', self.count))
+        return result
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else None,
+            'last': self.last,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (kind, help, {labels tuple: metric})
+        self._families = {}
+
+    def _get(self, cls, name, help_text, labels):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is None or key not in family[2]:
+            with self._lock:
+                family = self._families.setdefault(name, (cls.kind, help_text, {}))
+                if family[0] != cls.kind:
+                    raise ValueError(f"Metric {name} already registered as a {family[0]}")
+                family[2].setdefault(key, cls())
+        return family[2][key]
+
+    def counter(self, name, help_text='', **labels):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text='', **labels):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text='', **labels):
+        return self._get(Histogram, name, help_text, labels)
+
+    def render_prometheus(self):
+        lines = []
+        for name, (kind, help_text, children) in sorted(self._families.items()):
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, metric in list(children.items()):
+                for sample_name, value in metric.samples(name, labels):
+                    lines.append(f'{sample_name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """JSON-friendly view, keyed by metric name and label string"""
+        result = {}
+        for name, (kind, _, children) in self._families.items():
+            for labels, metric in list(children.items()):
+                result[name + _format_labels(labels)] = metric.snapshot()
+        return result
+
+REGISTRY = Registry()
+
+def timed(name, help_text='', **labels):
+    """Decorator recording the wrapped call's latency in a histogram"""
+    histogram = REGISTRY.histogram(name, help_text, **labels)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -1,8 +1,17 @@
-import streamlit as st
-from database import Database
-from monitoring import NetworkMonitor
-from components.device_manager import render_device_manager
-from components.dashboard import render_dashboard
+from profiling import STARTUP
+
+with STARTUP.phase('import streamlit'):
+    import streamlit as st
+with STARTUP.phase('import database'):
+    from database import Database
+with STARTUP.phase('import components.device_manager'):
+    from components.device_manager import render_device_manager
+with STARTUP.phase('import components.dashboard'):
+    from components.dashboard import render_dashboard
+with STARTUP.phase('import components.comparison'):
+    from components.comparison import render_comparison
+with STARTUP.phase('import components.monitor_health'):
+    from components.monitor_health import render_monitor_status
 
 # Page configuration
 st.set_page_config(
@@ -11,21 +20,28 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize database and monitoring
+# Initialize database. Probing runs in the separate monitor daemon
+# (daemon.py), the UI only reads what it writes.
 @st.cache_resource
 def init_resources():
-    db = Database()
-    monitor = NetworkMonitor(db)
-    monitor.start_monitoring()
-    return db, monitor
+    with STARTUP.phase('init_resources'):
+        return Database()
+
+db = init_resources()
 
-db, monitor = init_resources()
+# NETWORK_MONITOR_PROFILE_STARTUP=1 reports the above once per process
+if startup_report := STARTUP.report():
+    with st.sidebar.expander("Startup Profile"):
+        st.code('\n'.join(startup_report))
 
 # Sidebar navigation
-page = st.sidebar.radio("Navigation", ["Dashboard", "Device Manager"])
+page = st.sidebar.radio("Navigation", ["Dashboard", "Device Manager", "Compare"])
+render_monitor_status()
 
 if page == "Dashboard":
-    render_dashboard(db, monitor)
+    render_dashboard(db)
+elif page == "Compare":
+    render_comparison(db)
 else:
     render_device_manager(db)
 
@@ -1,80 +1,274 @@
+import asyncio
+import logging
 import threading
 import time
-from ping3 import ping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 import statistics
+from instrumentation import REGISTRY
+from probes import PING_SECONDS, AsyncProber, Ping3Backend
+
+logger = logging.getLogger(__name__)
+
+PINGS_OK = REGISTRY.counter('network_monitor_pings', 'Ping attempts by result', result='ok')
+PINGS_TIMEOUT = REGISTRY.counter('network_monitor_pings', 'Ping attempts by result', result='timeout')
+PINGS_ERROR = REGISTRY.counter('network_monitor_pings', 'Ping attempts by result', result='error')
+PROBE_SECONDS = REGISTRY.histogram(
+    'network_monitor_probe_seconds', 'Time to collect detailed metrics for one device')
+SWEEP_SECONDS = REGISTRY.histogram(
+    'network_monitor_sweep_seconds', 'Time to probe and record every device once')
+SWEEP_ERRORS = REGISTRY.counter('network_monitor_sweep_errors', 'Sweeps aborted by an exception')
+SCHEDULE_LAG = REGISTRY.histogram(
+    'network_monitor_schedule_lag_seconds', 'How late a sweep started relative to its slot')
+PENDING_DEVICES = REGISTRY.gauge(
+    'network_monitor_sweep_pending_devices', 'Devices still queued in the current sweep')
+CONFIG_RELOADS = REGISTRY.counter(
+    'network_monitor_device_config_reloads', 'Times the monitor reloaded its device list')
+
+DEFAULT_CONCURRENCY = 100
+
+def summarize_probes(rtts, num_probes):
+    """Build a monitoring record's metrics from the replies of one device's probes"""
+    metrics = {
+        'response_time': -1,
+        'min_rtt': -1,
+        'max_rtt': -1,
+        'avg_rtt': -1,
+        'jitter': -1,
+        'packet_loss': ((num_probes - len(rtts)) / num_probes) * 100,
+        'status': False
+    }
+
+    if rtts:
+        metrics.update({
+            'response_time': rtts[-1],
+            'min_rtt': min(rtts),
+            'max_rtt': max(rtts),
+            'avg_rtt': statistics.mean(rtts),
+            'jitter': statistics.stdev(rtts) if len(rtts) > 1 else 0,
+            'status': True
+        })
+
+    return metrics
 
 class NetworkMonitor:
-    def __init__(self, database):
+    def __init__(self, database, interval=60, backend=None, ping_delay=0.2,
+                 concurrency=DEFAULT_CONCURRENCY):
         self.database = database
+        self.interval = interval
+        # Real ICMP by default; load tests plug in simulator.NetworkSimulator
+        self.backend = backend or Ping3Backend()
+        self.ping_delay = ping_delay
+        # Every probe type runs on one event loop, at most `concurrency` probes in flight
+        self.prober = AsyncProber(self.backend, concurrency)
+        self._loop = None
+        self._sweep_task = None
+        # Records are written on one thread off the event loop, so a slow
+        # commit never stalls (and inflates the RTT of) probes in flight
+        self._writer = None
         self.running = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()
+        # Progress markers reported by the daemon's health endpoint
+        self.started_at = None
+        self.heartbeat = None
+        self.last_sweep_started = None
+        self.last_sweep_finished = None
+        self.last_sweep_duration = None
+        self.sweep_count = 0
+        self.last_error = None
+        # Device list with parsed thresholds, reloaded only when the
+        # database's device config version moves
+        self._devices = []
+        self._config_version = None
 
     def start_monitoring(self):
         if not self.running:
             self.running = True
+            self._stop_event.clear()
+            self.started_at = time.time()
+            self.heartbeat = self.started_at
             self.monitor_thread = threading.Thread(target=self._monitoring_loop)
             self.monitor_thread.daemon = True
             self.monitor_thread.start()
 
     def stop_monitoring(self):
         self.running = False
+        self._stop_event.set()
+        # Probes already past the running check are cancelled rather than
+        # finishing the whole sweep
+        task = self._sweep_task
+        if task is not None and not task.done():
+            self._loop.call_soon_threadsafe(task.cancel)
         if self.monitor_thread:
             self.monitor_thread.join()
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        self.prober.close()
+        # Close every device's current state so the downtime until the next
+        # start is left out of availability
+        try:
+            self.database.mark_monitoring_stopped()
+        except Exception:
+            logger.exception("Could not record the monitor stopping")
 
     def _collect_detailed_metrics(self, ip_address, num_pings=5):
         ping_results = []
-        packet_loss = 0
 
         for _ in range(num_pings):
+            start = time.perf_counter()
             try:
-                response_time = ping(ip_address, timeout=2)
-                if response_time is not None:
+                response_time = self.backend.ping(ip_address, timeout=2)
+                if response_time not in (None, False):
                     ping_results.append(response_time)
+                    PINGS_OK.inc()
                 else:
-                    packet_loss += 1
+                    PINGS_TIMEOUT.inc()
             except Exception:
-                packet_loss += 1
-            time.sleep(0.2)  # Small delay between pings
-
-        metrics = {
-            'response_time': -1,
-            'min_rtt': -1,
-            'max_rtt': -1,
-            'avg_rtt': -1,
-            'jitter': -1,
-            'packet_loss': (packet_loss / num_pings) * 100,
-            'status': False
-        }
+                PINGS_ERROR.inc()
+            PING_SECONDS.observe(time.perf_counter() - start)
+            if self.ping_delay:
+                time.sleep(self.ping_delay)  # Small delay between pings
+
+        return summarize_probes(ping_results, num_pings)
+
+    async def _collect_device_metrics(self, device, num_probes=5):
+        """Same metrics as _collect_detailed_metrics, for any probe type"""
+        rtts = []
+        for _ in range(num_probes):
+            # The prober times the probe itself, leaving out its queue wait
+            try:
+                response_time = await self.prober.probe(device, timeout=2)
+                if response_time is not None:
+                    rtts.append(response_time)
+                    PINGS_OK.inc()
+                else:
+                    PINGS_TIMEOUT.inc()
+            except Exception:
+                PINGS_ERROR.inc()
+            if self.ping_delay:
+                await asyncio.sleep(self.ping_delay)
+        return summarize_probes(rtts, num_probes)
+
+    def _device_registry(self):
+        version = self.database.get_config_version()
+        if version != self._config_version:
+            self._devices = [
+                {
+                    'id': device['id'],
+                    'ip_address': device['ip_address'],
+                    'probe_type': device['probe_type'],
+                    'probe_port': device['probe_port'],
+                    'probe_target': device['probe_target'],
+                    'thresholds': {
+                        field: float(device[field]) if device[field] is not None else None
+                        for field in ('response_time_threshold', 'packet_loss_threshold', 'jitter_threshold')
+                    },
+                }
+                for device in self.database.get_devices()
+            ]
+            self._config_version = version
+            CONFIG_RELOADS.inc()
+        return self._devices
 
-        if ping_results:
-            metrics.update({
-                'response_time': ping_results[-1],
-                'min_rtt': min(ping_results),
-                'max_rtt': max(ping_results),
-                'avg_rtt': statistics.mean(ping_results),
-                'jitter': statistics.stdev(ping_results) if len(ping_results) > 1 else 0,
-                'status': True
-            })
+    def _sweep(self):
+        # Edits made since the last sweep are picked up here
+        devices = self._device_registry()
+        PENDING_DEVICES.set(len(devices))
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='record-writer')
+        self._sweep_task = self._loop.create_task(self._sweep_devices(devices))
+        try:
+            self._loop.run_until_complete(self._sweep_task)
+        except asyncio.CancelledError:
+            # stop_monitoring() cut the sweep short; what was recorded stays
+            pass
+        finally:
+            self._sweep_task = None
 
-        return metrics
+    async def _sweep_devices(self, devices):
+        async def sweep_device(device):
+            # Leave the sweep early so shutdown is not held up by a long device list
+            if not self.running:
+                return
+            with PROBE_SECONDS.time():
+                metrics = await self._collect_device_metrics(device)
+            await asyncio.get_running_loop().run_in_executor(self._writer, partial(
+                self.database.add_monitoring_record,
+                device['id'],
+                metrics['response_time'],
+                metrics['status'],
+                metrics['min_rtt'],
+                metrics['max_rtt'],
+                metrics['avg_rtt'],
+                metrics['jitter'],
+                metrics['packet_loss'],
+                thresholds=device['thresholds'],
+                # Samples further apart than this mean the monitor wasn't running
+                max_gap=2 * self.interval + 60
+            ))
+            PENDING_DEVICES.dec()
+            self.heartbeat = time.time()
+
+        results = await asyncio.gather(*(sweep_device(device) for device in devices),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            # Devices that did record are kept; the sweep still counts as failed
+            raise errors[0]
 
     def _monitoring_loop(self):
+        next_slot = time.time()
         while self.running:
-            devices = self.database.get_devices()
-            for device in devices:
-                metrics = self._collect_detailed_metrics(device['ip_address'])
-                self.database.add_monitoring_record(
-                    device['id'],
-                    metrics['response_time'],
-                    metrics['status'],
-                    metrics['min_rtt'],
-                    metrics['max_rtt'],
-                    metrics['avg_rtt'],
-                    metrics['jitter'],
-                    metrics['packet_loss']
-                )
-            time.sleep(60)  # Monitor every minute
+            self.last_sweep_started = time.time()
+            self.heartbeat = self.last_sweep_started
+            SCHEDULE_LAG.observe(max(0.0, self.last_sweep_started - next_slot))
+            try:
+                with SWEEP_SECONDS.time():
+                    self._sweep()
+                self.last_error = None
+            except Exception as e:
+                # A failed sweep (e.g. a locked database) must not kill the thread
+                self.last_error = str(e)
+                SWEEP_ERRORS.inc()
+                logger.exception("Monitoring sweep failed")
+            PENDING_DEVICES.set(0)
+            self.last_sweep_finished = time.time()
+            self.last_sweep_duration = self.last_sweep_finished - self.last_sweep_started
+            self.sweep_count += 1
+            # Sweeps start on a fixed cadence; one that overruns its slot
+            # starts the next immediately and shows up as schedule lag
+            next_slot = self.last_sweep_started + self.interval
+            self._stop_event.wait(max(0.0, next_slot - time.time()))
+
+    def get_status(self):
+        """Snapshot of the monitor state for health reporting"""
+        def _iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        now = time.time()
+        thread_alive = bool(self.monitor_thread and self.monitor_thread.is_alive())
+        # A single device takes at most a few seconds to probe, so a heartbeat
+        # older than two intervals means the loop is wedged
+        stale = bool(self.heartbeat and now - self.heartbeat > 2 * self.interval + 60)
+        return {
+            'running': self.running and thread_alive,
+            'stale': stale,
+            'interval': self.interval,
+            'uptime_seconds': now - self.started_at if self.started_at else 0,
+            'sweep_count': self.sweep_count,
+            'last_sweep_started': _iso(self.last_sweep_started),
+            'last_sweep_finished': _iso(self.last_sweep_finished),
+            'last_sweep_duration': self.last_sweep_duration,
+            'last_error': self.last_error,
+        }
 
     def check_device(self, ip_address):
         metrics = self._collect_detailed_metrics(ip_address)
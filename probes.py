@@ -0,0 +1,205 @@
+"""Probe backends used by the NetworkMonitor.
+
+A backend answers a single echo request: ping() returns the round-trip
+time in seconds, or None when the request was lost. The monitor repeats it
+to build the detailed metrics for a device, so any backend (real ICMP or the
+in-process simulator in simulator.py) produces the same records.
+
+Devices that drop ICMP can be probed with a TCP handshake, an HTTP HEAD
+request or a DNS query instead. AsyncProber runs all of them as coroutines
+on one event loop under a shared concurrency limit.
+"""
+import asyncio
+import random
+import ssl
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from ping3 import ping as ping3_ping
+
+from instrumentation import REGISTRY
+
+PING_SECONDS = REGISTRY.histogram(
+    'network_monitor_ping_seconds', 'Wall time of a single probe call, including timeouts')
+PROBE_QUEUE_SECONDS = REGISTRY.histogram(
+    'network_monitor_probe_queue_seconds', 'Time a probe waited for a concurrency slot or ICMP worker')
+
+class ProbeBackend:
+    """Interface for anything that can time a single echo request"""
+
+    name = 'base'
+
+    def ping(self, ip_address, timeout=2):
+        raise NotImplementedError
+
+class Ping3Backend(ProbeBackend):
+    """Real ICMP echo through ping3"""
+
+    name = 'icmp'
+
+    def ping(self, ip_address, timeout=2):
+        return ping3_ping(ip_address, timeout=timeout)
+
+# Probe types selectable per device (devices.probe_type)
+PROBE_TYPES = ('icmp', 'tcp', 'http', 'dns')
+DEFAULT_PORTS = {'tcp': 80, 'http': 80, 'dns': 53}
+DEFAULT_DNS_NAME = 'localhost'
+
+def _probe_tls_context():
+    # A reachability probe, not a security check: switches, APs and printers
+    # mostly serve self-signed certificates and are addressed by IP, so the
+    # chain and hostname are not verified
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+_TLS_CONTEXT = _probe_tls_context()
+
+async def tcp_connect_rtt(host, port, timeout=2):
+    """Time to complete a TCP handshake, or None if refused or timed out"""
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    rtt = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return rtt
+
+async def http_head_rtt(host, port, target=None, timeout=2):
+    """Time from connecting to the status line of a HEAD request.
+
+    target is a path ('/health') or a full http(s) URL; any HTTP response,
+    whatever its status code, counts as a reply. https certificates are
+    not verified.
+    """
+    scheme, path = 'http', target or '/'
+    if target and '://' in target:
+        url = urlsplit(target)
+        scheme, host = url.scheme, url.hostname or host
+        port = url.port or (443 if scheme == 'https' else port)
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+    start = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=_TLS_CONTEXT if scheme == 'https' else None),
+            timeout
+        )
+        writer.write(f'HEAD {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+        status_line = await asyncio.wait_for(reader.readline(), max(0.0, timeout - (time.perf_counter() - start)))
+    except (OSError, asyncio.TimeoutError, ssl.SSLError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+    if not status_line.startswith(b'HTTP/'):
+        return None
+    return time.perf_counter() - start
+
+def _dns_query(query_id, name):
+    # Header: id, recursion desired, one question; then QNAME, QTYPE A, QCLASS IN
+    labels = b''.join(bytes([len(part)]) + part.encode('idna') for part in name.strip('.').split('.') if part)
+    return struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + labels + b'\x00' + struct.pack('>HH', 1, 1)
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id, reply):
+        self.query_id = query_id
+        self.reply = reply
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack('>H', data[:2])[0] == self.query_id and not self.reply.done():
+            self.reply.set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+async def dns_query_rtt(server, port=53, name=None, timeout=2):
+    """Time for a DNS server to answer an A query; any answer, even NXDOMAIN, counts"""
+    loop = asyncio.get_running_loop()
+    reply = loop.create_future()
+    query_id = random.getrandbits(16)
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DnsProtocol(query_id, reply), remote_addr=(server, port))
+    except OSError:
+        return None
+    try:
+        start = time.perf_counter()
+        transport.sendto(_dns_query(query_id, name or DEFAULT_DNS_NAME))
+        return await asyncio.wait_for(reply, timeout) - start
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        transport.close()
+
+class AsyncProber:
+    """Runs every probe type as coroutines on one event loop.
+
+    A shared semaphore caps the probes in flight across all devices. ICMP
+    goes through the synchronous backend on a bounded thread pool, so the
+    simulator and ping3 plug in unchanged.
+    """
+
+    def __init__(self, backend=None, concurrency=256, icmp_workers=64):
+        self.backend = backend or Ping3Backend()
+        self.concurrency = concurrency
+        self.icmp_workers = icmp_workers
+        self._executor = None
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def probe(self, device, timeout=2):
+        """One echo of the device's probe type: RTT in seconds or None"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            # Created per loop, since a semaphore cannot be shared across loops
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        probe_type = device.get('probe_type') or 'icmp'
+        host = device['ip_address']
+        port = device.get('probe_port') or DEFAULT_PORTS.get(probe_type)
+        target = device.get('probe_target')
+        if probe_type not in PROBE_TYPES:
+            raise ValueError(f"Unknown probe type: {probe_type}")
+        # PING_SECONDS times the probe itself; waiting for a slot (and for
+        # an ICMP worker) goes to PROBE_QUEUE_SECONDS
+        queued = time.perf_counter()
+        async with self._semaphore:
+            if probe_type == 'icmp':
+                if self._executor is None:
+                    # Created on first use, so the prober works again after close()
+                    self._executor = ThreadPoolExecutor(max_workers=self.icmp_workers,
+                                                        thread_name_prefix='icmp-probe')
+                reply = await loop.run_in_executor(
+                    self._executor, self._ping, host, timeout, queued)
+                # ping3 returns False for unresolvable or unreachable hosts
+                return None if reply is False else reply
+            PROBE_QUEUE_SECONDS.observe(time.perf_counter() - queued)
+            with PING_SECONDS.time():
+                if probe_type == 'tcp':
+                    return await tcp_connect_rtt(host, port, timeout)
+                if probe_type == 'http':
+                    return await http_head_rtt(host, port, target, timeout)
+                return await dns_query_rtt(host, port, target, timeout)
+
+    def _ping(self, host, timeout, queued):
+        """backend.ping on a pool thread, timed from when a worker picks it up"""
+        PROBE_QUEUE_SECONDS.observe(time.perf_counter() - queued)
+        with PING_SECONDS.time():
+            return self.backend.ping(host, timeout)
@@ -0,0 +1,206 @@
+"""Opt-in startup and per-rerun render profiling for the Streamlit app.
+
+Set NETWORK_MONITOR_PROFILE_STARTUP=1 and main.py times each of its module
+imports, Database.create_tables and init_resources. Each phase also records
+which non-stdlib packages it pulled in for the first time, so a heavy
+import sneaking back to module level shows up as e.g.
+
+    import components.dashboard   1012.3 ms  (+pandas, +reportlab)
+
+The report is logged once per process and shown in a sidebar expander.
+Streamlit reruns main.py on every interaction but imports are cached per
+process, so only the first run is recorded. For a full per-module
+breakdown run `python -X importtime main.py` instead.
+
+Set NETWORK_MONITOR_PROFILE_RENDER=1 and every rerun of the dashboard and
+device manager records a span per phase (query, figure construction,
+st.plotly_chart serialization), tagged with the device it was for. Query
+spans carry the rows returned and the rows the Database decoded to produce
+them. Each rerun is appended as one JSON line to a rotating trace file
+(NETWORK_MONITOR_PROFILE_TRACE, default render_profile.jsonl) and
+summarized in a "Render Profile" expander at the bottom of the page. When
+disabled, render_profiler() hands out a shared no-op profiler.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+STARTUP_ENV = 'NETWORK_MONITOR_PROFILE_STARTUP'
+RENDER_ENV = 'NETWORK_MONITOR_PROFILE_RENDER'
+TRACE_ENV = 'NETWORK_MONITOR_PROFILE_TRACE'
+DEFAULT_TRACE_PATH = 'render_profile.jsonl'
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+def _env_enabled(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _top_level_modules():
+    return {name.partition('.')[0] for name in sys.modules}
+
+class StartupProfiler:
+    def __init__(self, enabled=None):
+        self.enabled = _env_enabled(STARTUP_ENV) if enabled is None else enabled
+        self.phases = []
+        self.reported = False
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block and note the packages it imported first"""
+        if not self.enabled or self.reported:
+            yield
+            return
+        before = _top_level_modules()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            loaded = sorted(name for name in _top_level_modules() - before
+                            if not name.startswith('_') and name not in sys.stdlib_module_names)
+            self.phases.append({'name': name, 'seconds': elapsed, 'loaded': loaded})
+
+    def lines(self):
+        lines = []
+        for phase in self.phases:
+            line = f"{phase['name']:<32} {phase['seconds'] * 1000:8.1f} ms"
+            if phase['loaded']:
+                line += '  (' + ', '.join('+' + name for name in phase['loaded']) + ')'
+            lines.append(line)
+        lines.append(f"{'total since profiler start':<32} {self.total() * 1000:8.1f} ms")
+        return lines
+
+    def total(self):
+        return (self._finished or time.perf_counter()) - self._started
+
+    def report(self):
+        """Log the profile once; returns the report lines, or None when disabled"""
+        if not self.enabled:
+            return None
+        if not self.reported:
+            self.reported = True
+            self._finished = time.perf_counter()
+            logger.info("Startup profile:\n%s", '\n'.join(self.lines()))
+        return self.lines()
+
+STARTUP = StartupProfiler()
+
+_trace_logger = None
+_trace_lock = threading.Lock()
+
+def _get_trace_logger():
+    """A logger writing bare JSON lines to the rotating trace file"""
+    global _trace_logger
+    with _trace_lock:
+        if _trace_logger is None:
+            trace_logger = logging.getLogger('network_monitor.render_trace')
+            trace_logger.propagate = False
+            trace_logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(os.environ.get(TRACE_ENV, DEFAULT_TRACE_PATH),
+                                          maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            trace_logger.addHandler(handler)
+            _trace_logger = trace_logger
+        return _trace_logger
+
+class RenderProfiler:
+    """Spans for one rerun of one page; see the module docstring"""
+
+    def __init__(self, page, database=None):
+        self.page = page
+        self.database = database
+        self.spans = []
+        self._started = time.perf_counter()
+
+    def _decoded(self):
+        return self.database.rows_decoded if self.database is not None else 0
+
+    @contextmanager
+    def phase(self, name, device_id=None):
+        span = {'phase': name, 'device_id': device_id}
+        decoded = self._decoded()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span['ms'] = (time.perf_counter() - start) * 1000
+            span['rows_decoded'] = self._decoded() - decoded
+            self.spans.append(span)
+
+    def query(self, name, func, *args, device_id=None, **kwargs):
+        """Call a Database method inside a span that records the rows it returned"""
+        with self.phase(name, device_id) as span:
+            result = func(*args, **kwargs)
+            span['rows'] = len(result) if isinstance(result, list) else None
+        return result
+
+    def summary(self):
+        """Spans grouped by phase, slowest first"""
+        phases = {}
+        for span in self.spans:
+            total = phases.setdefault(span['phase'], {
+                'phase': span['phase'], 'calls': 0, 'ms': 0.0, 'rows': 0, 'rows_decoded': 0,
+            })
+            total['calls'] += 1
+            total['ms'] += span['ms']
+            total['rows'] += span.get('rows') or 0
+            total['rows_decoded'] += span['rows_decoded']
+        return sorted(phases.values(), key=lambda total: total['ms'], reverse=True)
+
+    def finish(self):
+        """Append the rerun to the trace file and show the overlay"""
+        import streamlit as st
+
+        total_ms = (time.perf_counter() - self._started) * 1000
+        try:
+            _get_trace_logger().info(json.dumps({
+                'timestamp': datetime.now(pytz.UTC).isoformat(),
+                'page': self.page,
+                'total_ms': round(total_ms, 3),
+                'spans': [{key: round(value, 3) if isinstance(value, float) else value
+                           for key, value in span.items()} for span in self.spans],
+            }))
+        except OSError:
+            logger.exception("Could not write the render trace")
+
+        with st.expander(f"Render Profile: {self.page} ({total_ms:.0f} ms)"):
+            st.dataframe(
+                [{**total, 'ms': round(total['ms'], 1)} for total in self.summary()],
+                use_container_width=True, hide_index=True
+            )
+            st.caption("Per device")
+            st.dataframe(
+                [{**span, 'ms': round(span['ms'], 1)} for span in self.spans],
+                use_container_width=True, hide_index=True
+            )
+
+class _NullProfiler:
+    """Stand-in when render profiling is off: no timing, no allocation per span"""
+    _context = nullcontext()
+
+    def phase(self, name, device_id=None):
+        return self._context
+
+    def query(self, name, func, *args, device_id=None, **kwargs):
+        return func(*args, **kwargs)
+
+    def finish(self):
+        pass
+
+NULL_PROFILER = _NullProfiler()
+RENDER_ENABLED = _env_enabled(RENDER_ENV)
+
+def render_profiler(page, database=None):
+    return RenderProfiler(page, database) if RENDER_ENABLED else NULL_PROFILER
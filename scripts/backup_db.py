@@ -0,0 +1,56 @@
+"""Take an online snapshot of the monitoring database.
+
+Safe to run while the daemon is writing: pages are copied in small steps
+from a pinned read snapshot, so probes and the dashboard are not stalled.
+
+    python scripts/backup_db.py --dest backups/
+    python scripts/backup_db.py --dest snapshot.db --vacuum
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backup import DEFAULT_PAGES_PER_STEP, DEFAULT_STEP_SLEEP, backup_path, prune_backups  # noqa: E402
+from database import Database  # noqa: E402
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up the monitoring database")
+    parser.add_argument('--db', default=None,
+                        help="SQLite database path (default: $NETWORK_MONITOR_DB or network_monitor.db)")
+    parser.add_argument('--dest', required=True,
+                        help="Snapshot file, or a directory for a timestamped snapshot")
+    parser.add_argument('--pages-per-step', type=int, default=DEFAULT_PAGES_PER_STEP)
+    parser.add_argument('--sleep', type=float, default=DEFAULT_STEP_SLEEP,
+                        help="Seconds to pause between steps, to limit the I/O the copy takes")
+    parser.add_argument('--vacuum', action='store_true',
+                        help="Use VACUUM INTO (one step, compacted copy) instead of the backup API")
+    parser.add_argument('--keep', type=int, default=0,
+                        help="With a directory --dest, keep only this many snapshots (0 keeps all)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    dest = args.dest
+    into_dir = os.path.isdir(dest) or dest.endswith(os.sep)
+    if into_dir:
+        os.makedirs(dest, exist_ok=True)
+        dest = backup_path(dest, db.db_path)
+
+    def progress(copied, total):
+        print(f"\r  {copied}/{total} pages", end='', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    pages = db.backup(dest, args.pages_per_step, args.sleep, progress, vacuum=args.vacuum)
+    print(file=sys.stderr)
+    print(f"Wrote {dest} ({pages} pages) in {time.perf_counter() - start:.1f}s")
+    if into_dir and args.keep:
+        for removed in prune_backups(args.dest, db.db_path, args.keep):
+            print(f"Removed {removed}")
+    db.conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""Benchmark harness for probing, ingestion, queries, exports and charts.
+
+Builds synthetic monitoring_history datasets (cached in --data-dir so large
+ones are only generated once), times the hot paths against each of them and
+prints the results as JSON so runs can be compared across versions.
+
+    python scripts/benchmark.py --sizes 10k,1M --output bench.json
+    python scripts/benchmark.py --sizes 50M --suites queries --repeat 3
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from monitoring import DEFAULT_CONCURRENCY, NetworkMonitor  # noqa: E402
+from simulator import DeviceProfile, NetworkSimulator  # noqa: E402
+
+SUITES = ('ingest', 'queries', 'exports', 'charts', 'sweep')
+DEVICE_TYPES = ('Server', 'Network Switch', 'Router', 'Workstation', 'IoT Device')
+SAMPLE_INTERVAL = 60  # Seconds between synthetic samples of one device
+INSERT_CHUNK = 50000
+# Bump when derived tables change so cached datasets are rebuilt
+DATASET_VERSION = 3
+
+def parse_size(value):
+    """Accept plain integers or k/M suffixes (10k, 50M)"""
+    value = value.strip().lower()
+    multiplier = 1
+    if value.endswith('k'):
+        multiplier, value = 1000, value[:-1]
+    elif value.endswith('m'):
+        multiplier, value = 1000000, value[:-1]
+    return int(float(value) * multiplier)
+
+def measure(func, repeat):
+    """Run func repeat times and summarise the wall times in seconds"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    stats = {
+        'repeat': repeat,
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': timings[-1],
+        'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+    }
+    return stats, result
+
+def _synthetic_rows(device_ids, size, seed):
+    """Yield monitoring_history rows ending now, interleaved across devices"""
+    rng = random.Random(seed)
+    per_device = -(-size // len(device_ids))
+    now = datetime.now(pytz.UTC).replace(tzinfo=None)
+    start = now - timedelta(seconds=per_device * SAMPLE_INTERVAL)
+    base_rtt = {device_id: rng.uniform(0.001, 0.05) for device_id in device_ids}
+    emitted = 0
+    for step in range(per_device):
+        timestamp = (start + timedelta(seconds=step * SAMPLE_INTERVAL)).strftime('%Y-%m-%d %H:%M:%S.%f')
+        for device_id in device_ids:
+            if emitted >= size:
+                return
+            emitted += 1
+            if rng.random() < 0.02:
+                yield (device_id, -1.0, 0, -1.0, -1.0, -1.0, -1.0, 100.0, 'packet_loss', timestamp)
+                continue
+            rtt = base_rtt[device_id]
+            samples = [max(0.0001, rng.gauss(rtt, rtt * 0.2)) for _ in range(5)]
+            avg = sum(samples) / 5
+            yield (device_id, samples[-1], 1, min(samples), max(samples), avg,
+                   statistics.stdev(samples), 0.0, None, timestamp)
+
+def build_dataset(data_dir, size, num_devices, seed):
+    """Create (or reuse) a database holding size synthetic samples"""
+    path = os.path.join(data_dir, f'bench_v{DATASET_VERSION}_{size}_{num_devices}_{seed}.db')
+    if os.path.exists(path):
+        return path, False
+
+    tmp_path = path + '.partial'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = Database(tmp_path)
+    rng = random.Random(seed)
+    device_ids = []
+    for idx in range(num_devices):
+        device_ids.append(db.add_device(
+            f'10.{idx // 65536 % 256}.{idx // 256 % 256}.{idx % 256}',
+            f'Benchmark device {idx}',
+            [f'site-{idx % 5}', f'rack-{idx % 20}'],
+            rng.choice(DEVICE_TYPES), 0.1, 5.0, 0.02
+        ))
+
+    rows = _synthetic_rows(device_ids, size, seed)
+    while True:
+        chunk = [row for _, row in zip(range(INSERT_CHUNK), rows)]
+        if not chunk:
+            break
+        with db.conn:
+            db.conn.executemany(
+                """
+                INSERT INTO monitoring_history
+                (device_id, response_time, status, min_rtt, max_rtt,
+                avg_rtt, jitter, packet_loss, threshold_violations, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                chunk
+            )
+    db.rebuild_state_transitions()
+    db.rebuild_rollups()
+    db.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    db.conn.close()
+    os.replace(tmp_path, path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    return path, True
+
+def bench_ingest(db, device, args):
+    max_id = db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM monitoring_history").fetchone()[0]
+    max_transition = db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM device_state_transitions").fetchone()[0]
+    started = datetime.now(pytz.UTC)
+    count = args.ingest_records
+
+    def run():
+        for i in range(count):
+            db.add_monitoring_record(device['id'], 0.01, True, 0.009, 0.012, 0.01, 0.001, 0.0)
+
+    stats, _ = measure(run, args.repeat)
+    # Leave the cached dataset as it was
+    with db.conn:
+        db.conn.execute("DELETE FROM monitoring_history WHERE id > ?", (max_id,))
+        db.conn.execute("DELETE FROM device_state_transitions WHERE id > ?", (max_transition,))
+    db.rebuild_rollups(device_id=device['id'], since=started)
+    return [{
+        'name': 'add_monitoring_record',
+        'records': count,
+        'stats': stats,
+        'records_per_second': count / stats['median'] if stats['median'] else None,
+    }]
+
+def bench_queries(db, device, args):
+    results = []
+    for limit in (100, 1000, None):
+        stats, rows = measure(lambda: db.get_device_history(device['id'], limit=limit), args.repeat)
+        results.append({'name': 'get_device_history', 'limit': limit, 'rows': len(rows), 'stats': stats})
+    for hours in (24, 72):
+        stats, rows = measure(lambda: db.get_device_trends(device['id'], hours=hours), args.repeat)
+        results.append({'name': 'get_device_trends', 'hours': hours, 'rows': len(rows), 'stats': stats})
+    for hours in (24, 24 * 30):
+        stats, summary = measure(lambda: db.get_availability(device['id'], hours=hours), args.repeat)
+        results.append({'name': 'get_availability', 'hours': hours,
+                        'outages': summary['outage_count'], 'stats': stats})
+    for hours in (24, 24 * 30):
+        stats, chunks = measure(lambda: db.get_device_columns(device['id'], hours=hours), args.repeat)
+        results.append({'name': 'get_device_columns', 'hours': hours,
+                        'rows': sum(len(columns['ts']) for _, columns in chunks), 'stats': stats})
+    for group_by in ('tag', 'device_type'):
+        stats, rows = measure(lambda: db.get_fleet_aggregates(group_by=group_by, hours=24), args.repeat)
+        results.append({'name': 'get_fleet_aggregates', 'group_by': group_by, 'rows': len(rows), 'stats': stats})
+    for hours in (24, 24 * 30):
+        stats, _ = measure(lambda: db.get_response_time_percentiles(device['id'], hours=hours), args.repeat)
+        results.append({'name': 'get_response_time_percentiles', 'hours': hours, 'stats': stats})
+    stats, rows = measure(db.get_devices, args.repeat)
+    results.append({'name': 'get_devices', 'rows': len(rows), 'stats': stats})
+    return results
+
+def bench_exports(db, device, args):
+    from components.export import export_device_data_csv, export_device_report_pdf
+
+    results = []
+    stats, data = measure(lambda: export_device_data_csv(db, device['id']), args.repeat)
+    results.append({'name': 'export_device_data_csv', 'bytes': len(data or ''), 'stats': stats})
+    stats, data = measure(lambda: export_device_report_pdf(db, device['id']), args.repeat)
+    results.append({'name': 'export_device_report_pdf', 'bytes': len(data or b''), 'stats': stats})
+    return results
+
+def bench_charts(db, device, args):
+    from components.charts import create_detailed_metrics_chart, create_trend_chart
+
+    results = []
+    for limit in (100, 1000):
+        history = db.get_device_history(device['id'], limit=limit)
+        stats, _ = measure(lambda: create_detailed_metrics_chart(history, device), args.repeat)
+        results.append({'name': 'create_detailed_metrics_chart', 'points': len(history), 'stats': stats})
+    trends = db.get_device_trends(device['id'], hours=72)
+    stats, _ = measure(lambda: create_trend_chart(trends), args.repeat)
+    results.append({'name': 'create_trend_chart', 'points': len(trends), 'stats': stats})
+    return results
+
+def bench_sweep(args):
+    """Time one full monitor sweep against the network simulator"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'sweep.db'))
+        if args.sweep_fleet:
+            sim = NetworkSimulator.fleet(args.sweep_devices, seed=args.seed,
+                                         realtime=not args.sweep_no_wait)
+        else:
+            profile = DeviceProfile(args.sweep_latency, args.sweep_jitter, args.sweep_loss)
+            sim = NetworkSimulator(seed=args.seed, realtime=not args.sweep_no_wait)
+            for idx in range(args.sweep_devices):
+                sim.add_device(f'10.0.{idx // 256 % 256}.{idx % 256}', profile)
+        sim.populate(db)
+        monitor = NetworkMonitor(db, backend=sim, ping_delay=args.sweep_ping_delay,
+                                 concurrency=args.sweep_concurrency)
+        monitor.running = True
+        stats, _ = measure(monitor._sweep, args.repeat)
+        monitor.stop_monitoring()
+        db.conn.close()
+    return [{
+        'name': 'monitor_sweep',
+        'devices': args.sweep_devices,
+        'latency': args.sweep_latency,
+        'jitter': args.sweep_jitter,
+        'loss': args.sweep_loss,
+        'ping_delay': args.sweep_ping_delay,
+        'concurrency': args.sweep_concurrency,
+        'fleet': args.sweep_fleet,
+        'realtime': not args.sweep_no_wait,
+        'stats': stats,
+        'devices_per_second': args.sweep_devices / stats['median'] if stats['median'] else None,
+    }]
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Network monitor benchmarks")
+    parser.add_argument('--sizes', default='10k,100k',
+                        help="Comma-separated monitoring_history sizes, e.g. 10k,1M,50M")
+    parser.add_argument('--devices', type=int, default=50, help="Devices in each dataset")
+    parser.add_argument('--suites', default=','.join(SUITES),
+                        help=f"Comma-separated subset of {','.join(SUITES)}")
+    parser.add_argument('--engines', default='sqlite',
+                        help="Raw sample storage to benchmark: sqlite, segments or both "
+                             "(segments are imported next to the cached dataset)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'network_monitor_bench'),
+                        help="Where generated datasets are cached between runs")
+    parser.add_argument('--ingest-records', type=int, default=1000)
+    parser.add_argument('--sweep-devices', type=int, default=100)
+    parser.add_argument('--sweep-latency', type=float, default=0.001, help="Simulated RTT in seconds")
+    parser.add_argument('--sweep-jitter', type=float, default=0.0)
+    parser.add_argument('--sweep-loss', type=float, default=0.0, help="Simulated loss ratio (0-1)")
+    parser.add_argument('--sweep-fleet', action='store_true',
+                        help="Use the simulator's mixed fleet instead of identical devices")
+    parser.add_argument('--sweep-no-wait', action='store_true',
+                        help="Return simulated pings instantly to measure monitor overhead only")
+    parser.add_argument('--sweep-ping-delay', type=float, default=0.0,
+                        help="Pause between pings (the monitor uses 0.2s)")
+    parser.add_argument('--sweep-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="Probes in flight during the sweep (1 probes devices one at a time)")
+    parser.add_argument('--output', help="Write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    suites = [s.strip() for s in args.suites.split(',') if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        print(f"Unknown suites: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    if set(engines) - {'sqlite', 'segments'}:
+        print(f"Unknown engines: {args.engines}", file=sys.stderr)
+        return 2
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    report = {
+        'revision': _git_revision(),
+        'timestamp': datetime.now(pytz.UTC).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'datasets': [],
+        'results': [],
+    }
+
+    dataset_suites = [s for s in suites if s != 'sweep']
+    if dataset_suites:
+        for size in (parse_size(s) for s in args.sizes.split(',') if s.strip()):
+            start = time.perf_counter()
+            path, generated = build_dataset(args.data_dir, size, args.devices, args.seed)
+            report['datasets'].append({
+                'rows': size,
+                'devices': args.devices,
+                'path': path,
+                'generated': generated,
+                'build_seconds': time.perf_counter() - start,
+            })
+            print(f"Dataset {size} rows ready ({path})", file=sys.stderr)
+
+            for engine in engines:
+                segment_dir = None
+                if engine == 'segments':
+                    segment_dir = path + '.segments'
+                    fresh = not os.path.isdir(segment_dir)
+                    db = Database(path, segment_dir=segment_dir)
+                    if fresh:
+                        db.copy_history_to_segments()
+                    db.conn.close()
+                db = Database(path, segment_dir=segment_dir)
+                device = db.get_devices()[0]
+                for suite in dataset_suites:
+                    # Ingest cleans up by deleting SQLite rows, which an
+                    # append-only segment store cannot do
+                    if engine == 'segments' and suite == 'ingest':
+                        continue
+                    for result in globals()[f'bench_{suite}'](db, device, args):
+                        result.update({'suite': suite, 'dataset_rows': size, 'engine': engine})
+                        report['results'].append(result)
+                        print(f"  {engine}/{suite}/{result['name']}: "
+                              f"median {result['stats']['median']*1000:.2f} ms", file=sys.stderr)
+                db.conn.close()
+
+    if 'sweep' in suites:
+        for result in bench_sweep(args):
+            result['suite'] = 'sweep'
+            report['results'].append(result)
+            print(f"  sweep/{result['name']}: median {result['stats']['median']*1000:.2f} ms",
+                  file=sys.stderr)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
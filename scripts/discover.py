@@ -0,0 +1,69 @@
+"""Discover live hosts in CIDR ranges, or import a device inventory.
+
+    python scripts/discover.py 192.168.1.0/24 10.20.0.0/16 --add --tags office
+    python scripts/discover.py --inventory devices.csv
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from discovery import (DEFAULT_RATE, DEFAULT_TIMEOUT, DEFAULT_WORKERS, device_from_host,  # noqa: E402
+                       discover, expand_targets, load_inventory)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover hosts or import an inventory")
+    parser.add_argument('cidrs', nargs='*', help="CIDR ranges or IP addresses to scan")
+    parser.add_argument('--db', default=None,
+                        help="SQLite database path (default: $NETWORK_MONITOR_DB or network_monitor.db)")
+    parser.add_argument('--inventory', help="CSV or YAML inventory to import instead of scanning")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Probes per second")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--attempts', type=int, default=1, help="Probes per address before giving up")
+    parser.add_argument('--add', action='store_true', help="Add the live hosts to the database")
+    parser.add_argument('--device-type', default='Other')
+    parser.add_argument('--tags', default='discovered', help="Comma-separated tags for added hosts")
+    args = parser.parse_args(argv)
+
+    if args.inventory:
+        with open(args.inventory, 'rb') as f:
+            devices, errors = load_inventory(f.read(), args.inventory.rsplit('.', 1)[-1].lower())
+        for error in errors:
+            print(error, file=sys.stderr)
+        if errors:
+            return 1
+        db = Database(args.db)
+        ids = db.add_devices(devices)
+        print(f"Imported {len(ids)} devices ({len(devices) - len(ids)} already monitored)")
+        return 0
+
+    if not args.cidrs:
+        parser.error("give CIDR ranges to scan or --inventory")
+    targets = expand_targets(args.cidrs)
+    start = time.perf_counter()
+    results = discover(
+        targets, rate=args.rate, workers=args.workers, timeout=args.timeout, attempts=args.attempts,
+        progress=lambda done, total: print(f"\r  {done}/{total}", end='', file=sys.stderr, flush=True)
+    )
+    print(file=sys.stderr)
+    alive = [host for host in results if host['alive']]
+    for host in alive:
+        print(f"{host['ip_address']}\t{host['response_time'] * 1000:.1f} ms")
+    print(f"{len(alive)} of {len(targets)} addresses answered in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+
+    if args.add and alive:
+        tags = [tag.strip() for tag in args.tags.split(',') if tag.strip()]
+        db = Database(args.db)
+        ids = db.add_devices([device_from_host(host['ip_address'], tags=tags, device_type=args.device_type)
+                              for host in alive])
+        print(f"Added {len(ids)} devices", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Copy monitoring_history into a columnar segment store.
+
+Run once before starting the daemon with --segment-dir; new samples then go
+to the segments only. The SQLite rows are left in place.
+
+    python scripts/import_segments.py --db network_monitor.db --segment-dir segments
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import raw samples into a segment store")
+    parser.add_argument('--db', default=None,
+                        help="SQLite database path (default: $NETWORK_MONITOR_DB or network_monitor.db)")
+    parser.add_argument('--segment-dir', required=True)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.segment_dir) and os.listdir(args.segment_dir):
+        print(f"{args.segment_dir} is not empty, refusing to import twice", file=sys.stderr)
+        return 1
+
+    db = Database(args.db, segment_dir=args.segment_dir)
+    start = time.perf_counter()
+    copied = db.copy_history_to_segments(
+        args.batch_size,
+        progress=lambda rows: print(f"  {rows} rows", file=sys.stderr)
+    )
+    db.conn.close()
+    print(f"Copied {copied} rows in {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Append-only columnar segment store for raw monitoring samples.
+
+An optional alternative to the monitoring_history table. Samples are
+appended to fixed-width column files, partitioned per device and month:
+
+    <root>/<device_id>/<YYYY-MM>/<column>.bin
+
+Timestamps are delta-encoded against the partition start as uint32
+milliseconds, metrics are float32, status is uint8 and threshold_violations
+is a uint16 bitmask (see VIOLATION_FLAGS). Reads map the files with
+numpy.memmap and slice them with a binary search on the timestamp column,
+so a year of one device's samples is twelve memory-mapped views and no
+copies. Timestamps keep millisecond precision.
+
+Writers only append, so readers in other processes (the dashboard) can map
+the files at any time. A crash between column writes can leave some
+columns a sample longer than others; readers use the shortest column, and
+the next append to that partition first truncates every column back to
+it, so rows stay aligned.
+"""
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+COLUMNS = (
+    ('ts', np.dtype('<u4')),
+    ('response_time', np.dtype('<f4')),
+    ('min_rtt', np.dtype('<f4')),
+    ('max_rtt', np.dtype('<f4')),
+    ('avg_rtt', np.dtype('<f4')),
+    ('jitter', np.dtype('<f4')),
+    ('packet_loss', np.dtype('<f4')),
+    ('status', np.dtype('u1')),
+    ('flags', np.dtype('<u2')),
+)
+METRIC_COLUMNS = ('response_time', 'min_rtt', 'max_rtt', 'avg_rtt', 'jitter', 'packet_loss')
+
+# Bit positions of the threshold_violations entries
+VIOLATION_FLAGS = (
+    'response_time', 'packet_loss', 'jitter',
+    'response_time_anomaly', 'packet_loss_anomaly', 'jitter_anomaly',
+)
+
+def encode_flags(violations):
+    mask = 0
+    for violation in violations:
+        if violation in VIOLATION_FLAGS:
+            mask |= 1 << VIOLATION_FLAGS.index(violation)
+    return mask
+
+def decode_flags(mask):
+    return [flag for bit, flag in enumerate(VIOLATION_FLAGS) if mask & (1 << bit)]
+
+def _partition_start(timestamp):
+    return timestamp.astimezone(pytz.UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_partition(start):
+    return (start + timedelta(days=32)).replace(day=1)
+
+class SegmentStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # Partitions whose columns this process has checked are aligned
+        self._aligned = set()
+
+    def _partition_dir(self, device_id, start):
+        return os.path.join(self.root, str(int(device_id)), start.strftime('%Y-%m'))
+
+    def _partitions(self, device_id):
+        """Month partition starts for a device, oldest first"""
+        device_dir = os.path.join(self.root, str(int(device_id)))
+        try:
+            names = sorted(os.listdir(device_dir))
+        except FileNotFoundError:
+            return []
+        starts = []
+        for name in names:
+            try:
+                starts.append(datetime.strptime(name, '%Y-%m').replace(tzinfo=pytz.UTC))
+            except ValueError:
+                continue
+        return starts
+
+    def append(self, device_id, timestamp, response_time, status, min_rtt, max_rtt,
+               avg_rtt, jitter, packet_loss, violations):
+        """Append one sample (timestamp is an aware datetime)"""
+        self.append_many(device_id, {
+            'ts': [timestamp],
+            'response_time': [response_time], 'min_rtt': [min_rtt], 'max_rtt': [max_rtt],
+            'avg_rtt': [avg_rtt], 'jitter': [jitter], 'packet_loss': [packet_loss],
+            'status': [1 if status else 0], 'flags': [encode_flags(violations)],
+        })
+
+    def append_many(self, device_id, columns):
+        """Append a batch of one device's samples, given column-wise.
+
+        columns['ts'] holds aware datetimes in ascending order and every
+        other column name maps to a list of the same length.
+        """
+        timestamps = columns['ts']
+        if not len(timestamps):
+            return
+        index = 0
+        while index < len(timestamps):
+            start = _partition_start(timestamps[index])
+            end = _next_partition(start)
+            stop = index
+            while stop < len(timestamps) and timestamps[stop] < end:
+                stop += 1
+            path = self._partition_dir(device_id, start)
+            os.makedirs(path, exist_ok=True)
+            if path not in self._aligned:
+                self._align(path)
+            # Until every column is written, the partition may be uneven
+            self._aligned.discard(path)
+            for name, dtype in COLUMNS:
+                if name == 'ts':
+                    values = [round((ts - start).total_seconds() * 1000) for ts in timestamps[index:stop]]
+                else:
+                    values = columns[name][index:stop]
+                data = np.asarray(values, dtype=dtype).tobytes()
+                fd = os.open(os.path.join(path, f'{name}.bin'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+            self._aligned.add(path)
+            index = stop
+
+    def _align(self, path):
+        """Truncate every column file in a partition to the shortest one's row count"""
+        sizes = {}
+        for name, dtype in COLUMNS:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(path, f'{name}.bin'))
+            except FileNotFoundError:
+                sizes[name] = 0
+        rows = min(size // dtype.itemsize for (name, dtype), size in zip(COLUMNS, sizes.values()))
+        for name, dtype in COLUMNS:
+            if sizes[name] > rows * dtype.itemsize:
+                os.truncate(os.path.join(path, f'{name}.bin'), rows * dtype.itemsize)
+
+    def _map_partition(self, device_id, start):
+        path = self._partition_dir(device_id, start)
+        views = {}
+        rows = None
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(path, f'{name}.bin')
+            try:
+                size = os.path.getsize(file_path)
+            except FileNotFoundError:
+                return None
+            count = size // dtype.itemsize
+            if count == 0:
+                return None
+            views[name] = np.memmap(file_path, dtype=dtype, mode='r', shape=(count,))
+            rows = count if rows is None else min(rows, count)
+        return {name: view[:rows] for name, view in views.items()}
+
+    def iter_partitions(self, device_id, start=None, end=None, newest_first=False):
+        """Yield (partition_start, {column: view}) for samples in [start, end).
+
+        Views are zero-copy slices of the memory-mapped column files; the
+        'ts' column holds milliseconds since partition_start.
+        """
+        partitions = self._partitions(device_id)
+        if newest_first:
+            partitions = partitions[::-1]
+        for partition in partitions:
+            if end is not None and partition >= end:
+                continue
+            if start is not None and _next_partition(partition) <= start:
+                continue
+            views = self._map_partition(device_id, partition)
+            if views is None:
+                continue
+            lo, hi = 0, len(views['ts'])
+            if start is not None and start > partition:
+                lo = int(np.searchsorted(views['ts'], (start - partition).total_seconds() * 1000, 'left'))
+            if end is not None and end < _next_partition(partition):
+                hi = int(np.searchsorted(views['ts'], (end - partition).total_seconds() * 1000, 'left'))
+            if hi > lo:
+                yield partition, {name: view[lo:hi] for name, view in views.items()}
+
+    def get_history(self, device_id, limit=100, start=None, end=None):
+        """Samples newest first, in the same shape as Database.get_device_history"""
+        history = []
+        for partition, views in self.iter_partitions(device_id, start, end, newest_first=True):
+            rows = len(views['ts'])
+            take = rows if limit is None else min(rows, limit - len(history))
+            columns = {name: view[rows - take:][::-1].tolist() for name, view in views.items()}
+            for i in range(take):
+                record = {
+                    'device_id': int(device_id),
+                    'timestamp': partition + timedelta(milliseconds=columns['ts'][i]),
+                    'status': bool(columns['status'][i]),
+                    'threshold_violations': decode_flags(columns['flags'][i]),
+                }
+                for name in METRIC_COLUMNS:
+                    record[name] = columns[name][i]
+                history.append(record)
+            if limit is not None and len(history) >= limit:
+                break
+        return history
+
+    def last_timestamp(self, device_id):
+        for partition, views in self.iter_partitions(device_id, newest_first=True):
+            return partition + timedelta(milliseconds=int(views['ts'][-1]))
+        return None
+
+    def drop_device(self, device_id):
+        device_dir = os.path.join(self.root, str(int(device_id)))
+        self._aligned = {path for path in self._aligned if os.path.dirname(path) != device_dir}
+        shutil.rmtree(device_dir, ignore_errors=True)
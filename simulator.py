@@ -0,0 +1,154 @@
+"""In-process network simulator for load testing without real hosts.
+
+NetworkSimulator is a probes.ProbeBackend that answers pings for thousands
+of virtual devices. Each device follows a DeviceProfile describing its RTT
+distribution, jitter, random loss, scheduled outages and flapping. Every
+device draws from its own generator seeded from (seed, ip), so a run with
+the same seed and clock produces the same samples.
+
+    sim = NetworkSimulator.fleet(2000, seed=7)
+    sim.populate(database)
+    monitor = NetworkMonitor(database, backend=sim, ping_delay=0)
+"""
+import ipaddress
+import math
+import random
+import threading
+import time
+
+from probes import ProbeBackend
+
+RTT_DISTRIBUTIONS = ('normal', 'lognormal', 'uniform', 'pareto')
+
+class DeviceProfile:
+    """Behaviour of one virtual device.
+
+    base_rtt and jitter are in seconds, loss is a 0-1 ratio. outages is a
+    list of (start, duration) pairs in seconds after the simulator started.
+    A flapping device is down for flap_down seconds out of every flap_period.
+    """
+
+    def __init__(self, base_rtt=0.005, jitter=0.001, loss=0.0, distribution='normal',
+                 outages=None, flap_period=None, flap_down=None, device_type='Server'):
+        if distribution not in RTT_DISTRIBUTIONS:
+            raise ValueError(f"Unknown RTT distribution: {distribution}")
+        self.base_rtt = base_rtt
+        self.jitter = jitter
+        self.loss = loss
+        self.distribution = distribution
+        self.outages = list(outages or [])
+        self.flap_period = flap_period
+        self.flap_down = flap_down if flap_down is not None else (flap_period or 0) / 2
+        self.device_type = device_type
+
+    def is_down(self, elapsed):
+        for start, duration in self.outages:
+            if start <= elapsed < start + duration:
+                return True
+        if self.flap_period:
+            return elapsed % self.flap_period < self.flap_down
+        return False
+
+    def sample_rtt(self, rng):
+        if self.distribution == 'lognormal':
+            # Median at base_rtt with jitter controlling the spread
+            sigma = math.log1p(self.jitter / self.base_rtt) if self.base_rtt else 0
+            rtt = rng.lognormvariate(math.log(self.base_rtt), sigma)
+        elif self.distribution == 'uniform':
+            rtt = rng.uniform(self.base_rtt - self.jitter, self.base_rtt + self.jitter)
+        elif self.distribution == 'pareto':
+            # Heavy tail of occasional very slow replies
+            rtt = self.base_rtt + self.jitter * (rng.paretovariate(3) - 1)
+        else:
+            rtt = rng.gauss(self.base_rtt, self.jitter)
+        return max(1e-6, rtt)
+
+class NetworkSimulator(ProbeBackend):
+    name = 'simulator'
+
+    def __init__(self, seed=0, default_profile=None, realtime=False, clock=time.time):
+        self.seed = seed
+        # Addresses without a profile use this one, or never answer if None
+        self.default_profile = default_profile
+        # Sleep for the simulated RTT (and the timeout on loss) like a real probe
+        self.realtime = realtime
+        self.clock = clock
+        self.started_at = clock()
+        self.profiles = {}
+        self._rngs = {}
+        self._lock = threading.Lock()
+
+    def add_device(self, ip_address, profile):
+        self.profiles[ip_address] = profile
+
+    def _rng(self, ip_address):
+        rng = self._rngs.get(ip_address)
+        if rng is None:
+            with self._lock:
+                rng = self._rngs.setdefault(ip_address, random.Random(f'{self.seed}:{ip_address}'))
+        return rng
+
+    def ping(self, ip_address, timeout=2):
+        profile = self.profiles.get(ip_address, self.default_profile)
+        if profile is None:
+            return self._lost(timeout)
+        rng = self._rng(ip_address)
+        if profile.is_down(self.clock() - self.started_at) or rng.random() < profile.loss:
+            return self._lost(timeout)
+        rtt = profile.sample_rtt(rng)
+        if rtt > timeout:
+            return self._lost(timeout)
+        if self.realtime:
+            time.sleep(rtt)
+        return rtt
+
+    def _lost(self, timeout):
+        if self.realtime:
+            time.sleep(timeout)
+        return None
+
+    @classmethod
+    def fleet(cls, count, seed=0, network='10.0.0.0/8', **kwargs):
+        """Build a simulator with a realistic mix of device behaviours.
+
+        Roughly 80% healthy, 10% lossy, 5% flapping and 5% with a scheduled
+        outage in the first hour.
+        """
+        sim = cls(seed=seed, **kwargs)
+        rng = random.Random(seed)
+        hosts = ipaddress.ip_network(network).hosts()
+        device_types = ('Server', 'Network Switch', 'Router', 'Workstation', 'IoT Device')
+        for _ in range(count):
+            ip_address = str(next(hosts))
+            base_rtt = rng.uniform(0.0005, 0.08)
+            roll = rng.random()
+            profile = DeviceProfile(
+                base_rtt=base_rtt,
+                jitter=base_rtt * rng.uniform(0.05, 0.5),
+                distribution=rng.choice(RTT_DISTRIBUTIONS),
+                device_type=rng.choice(device_types),
+            )
+            if roll < 0.10:
+                profile.loss = rng.uniform(0.05, 0.4)
+            elif roll < 0.15:
+                profile.flap_period = rng.uniform(120, 1800)
+                profile.flap_down = profile.flap_period * rng.uniform(0.1, 0.5)
+            elif roll < 0.20:
+                profile.outages.append((rng.uniform(0, 3600), rng.uniform(60, 900)))
+            sim.add_device(ip_address, profile)
+        return sim
+
+    def populate(self, database):
+        """Register every virtual device in the database, skipping existing IPs"""
+        existing = {device['ip_address'] for device in database.get_devices()}
+        added = 0
+        for ip_address, profile in self.profiles.items():
+            if ip_address in existing:
+                continue
+            database.add_device(
+                ip_address, f'Simulated {profile.distribution} device', ['simulated'],
+                profile.device_type, max(0.1, profile.base_rtt * 4), 5.0,
+                max(0.01, profile.jitter * 4)
+            )
+            added += 1
+        return added
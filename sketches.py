@@ -0,0 +1,100 @@
+"""Mergeable quantile sketches for response-time percentiles.
+
+QuantileSketch is a log-bucketed histogram in the style of DDSketch
+(Masson et al., 2019). A value x > 0 lands in bucket ceil(log_gamma(x)) with
+gamma = (1 + alpha) / (1 - alpha), and a quantile is answered with the
+bucket's midpoint 2 * gamma^i / (gamma + 1).
+
+Error bound: every returned quantile is within a relative error of alpha
+(1% by default) of the true value at that rank, and the bound still holds
+after any number of merges, because merging just adds bucket counts. RTTs
+between 0.1 ms and 10 s need at most ~570 buckets at 1%; an hour of one
+device's samples typically fills a few dozen (a few hundred bytes).
+"""
+import math
+import struct
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Values at or below this (seconds) are counted in a dedicated zero bucket
+MIN_VALUE = 1e-6
+
+_HEADER = struct.Struct('<dQddI')
+_BIN = struct.Struct('<iI')
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, count=1):
+        if value <= MIN_VALUE:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, bin_count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + bin_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def merge_bytes(self, data):
+        """Merge a serialized sketch without building an intermediate object"""
+        alpha, zero_count, low, high, num_bins = _HEADER.unpack_from(data)
+        if alpha != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        bins = self.bins
+        total = zero_count
+        for index, bin_count in _BIN.iter_unpack(data[_HEADER.size:_HEADER.size + num_bins * _BIN.size]):
+            bins[index] = bins.get(index, 0) + bin_count
+            total += bin_count
+        self.zero_count += zero_count
+        self.count += total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q (0-1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            cumulative += self.bins[index]
+            if cumulative > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(self.relative_accuracy, self.zero_count,
+                              self.min, self.max, len(self.bins))]
+        parts.extend(_BIN.pack(index, bin_count) for index, bin_count in sorted(self.bins.items()))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        relative_accuracy = _HEADER.unpack_from(data)[0]
+        return cls(relative_accuracy).merge_bytes(data)
@@ -0,0 +1,84 @@
+"""Round-trip tests for the cold archive block codec.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import (block_records, decode_block, encode_block, from_micros, read_block,  # noqa: E402
+                     to_micros, write_day_file, zstandard)
+from segment_store import METRIC_COLUMNS, encode_flags  # noqa: E402
+
+DAY = datetime(2026, 3, 1, tzinfo=pytz.UTC)
+
+def _columns(count, seed=0):
+    rng = np.random.default_rng(seed)
+    # A steady cadence with jitter, so delta-of-delta sees both zero and non-zero values
+    ts = [to_micros(DAY) + i * 60_000_000 + int(rng.integers(-500, 500)) for i in range(count)]
+    columns = {'ts': np.asarray(ts, dtype='<i8')}
+    for name in METRIC_COLUMNS:
+        columns[name] = rng.random(count) * 0.05
+    columns['response_time'][::7] = -1
+    columns['status'] = (rng.random(count) > 0.1).astype('u1')
+    columns['flags'] = np.asarray([encode_flags(['jitter', 'packet_loss_anomaly']) if i % 5 == 0 else 0
+                                   for i in range(count)], dtype='<u2')
+    return columns
+
+class BlockCodecTests(unittest.TestCase):
+    def assertColumnsEqual(self, expected, actual):
+        self.assertEqual(set(expected), set(actual))
+        for name, values in expected.items():
+            np.testing.assert_array_equal(np.asarray(values), actual[name], err_msg=name)
+
+    def test_round_trip(self):
+        columns = _columns(1440)
+        device_id, decoded = decode_block(encode_block(42, columns))
+        self.assertEqual(device_id, 42)
+        self.assertColumnsEqual(columns, decoded)
+
+    def test_single_sample(self):
+        columns = _columns(1)
+        self.assertColumnsEqual(columns, decode_block(encode_block(1, columns))[1])
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            decode_block(b'\x00' * 64)
+
+    def test_micros_round_trip(self):
+        timestamp = DAY + timedelta(hours=13, microseconds=123457)
+        self.assertEqual(from_micros(to_micros(timestamp)), timestamp)
+
+    def test_block_records(self):
+        columns = _columns(3)
+        records = block_records(7, columns)
+        self.assertEqual([r['timestamp'] for r in records],
+                         [from_micros(ts) for ts in columns['ts'][::-1]])
+        self.assertEqual(records[-1]['threshold_violations'], ['jitter', 'packet_loss_anomaly'])
+        self.assertEqual(records[-1]['device_id'], 7)
+
+    def test_day_file(self):
+        codecs = ['gzip'] + (['zstd'] if zstandard is not None else [])
+        blocks = [(1, _columns(100, seed=1)), (2, _columns(50, seed=2))]
+        for codec in codecs:
+            with self.subTest(codec=codec), tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'day.nma')
+                index = write_day_file(path, blocks, codec)
+                self.assertFalse(os.path.exists(path + '.tmp'))
+                for (device_id, columns), entry in zip(blocks, index):
+                    _, offset, length, count, first_ts, last_ts = entry
+                    self.assertEqual(entry[0], device_id)
+                    self.assertEqual((count, first_ts, last_ts),
+                                     (len(columns['ts']), columns['ts'][0], columns['ts'][-1]))
+                    self.assertColumnsEqual(columns, read_block(path, offset, length, codec))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Edge cases of utils.summarize_availability.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import summarize_availability  # noqa: E402
+
+START = datetime(2026, 5, 1, tzinfo=pytz.UTC)
+END = START + timedelta(hours=10)
+
+def at(hours):
+    return START + timedelta(hours=hours)
+
+class SummarizeAvailabilityTests(unittest.TestCase):
+    def test_always_up(self):
+        result = summarize_availability(True, [], START, END)
+        self.assertEqual(result['availability'], 100)
+        self.assertEqual(result['observed_seconds'], 10 * 3600)
+        self.assertEqual(result['outage_count'], 0)
+        self.assertIsNone(result['mttr_seconds'])
+
+    def test_outage_recovered(self):
+        result = summarize_availability(True, [(False, at(2)), (True, at(3))], START, END)
+        self.assertEqual(result['availability'], 90)
+        self.assertEqual(result['outage_count'], 1)
+        self.assertEqual(result['mttr_seconds'], 3600)
+        self.assertEqual(result['longest_outage_seconds'], 3600)
+
+    def test_outage_open_at_window_end(self):
+        result = summarize_availability(True, [(False, at(8))], START, END)
+        self.assertEqual(result['downtime_seconds'], 2 * 3600)
+        self.assertEqual(result['outage_count'], 1)
+        self.assertIsNone(result['mttr_seconds'])
+
+    def test_unknown_initial_state(self):
+        # Nothing known until the first transition
+        result = summarize_availability(None, [(True, at(4))], START, END)
+        self.assertEqual(result['observed_seconds'], 6 * 3600)
+        self.assertEqual(result['availability'], 100)
+
+    def test_monitor_down_is_not_counted(self):
+        # Up, monitor stopped for 5 h while the device was up, back up
+        result = summarize_availability(True, [(None, at(2)), (True, at(7))], START, END)
+        self.assertEqual(result['observed_seconds'], 5 * 3600)
+        self.assertEqual(result['availability'], 100)
+
+    def test_monitor_down_during_outage(self):
+        # Down, then the monitor stopped: only the observed hour is downtime
+        result = summarize_availability(True, [(False, at(1)), (None, at(2)), (True, at(9))], START, END)
+        self.assertEqual(result['downtime_seconds'], 3600)
+        self.assertEqual(result['uptime_seconds'], 2 * 3600)
+        self.assertEqual(result['outage_count'], 1)
+        # It ended unobserved, so it has no repair time
+        self.assertIsNone(result['mttr_seconds'])
+
+    def test_only_unknown(self):
+        result = summarize_availability(None, [(None, at(1))], START, END)
+        self.assertIsNone(result['availability'])
+        self.assertEqual(result['observed_seconds'], 0)
+
+    def test_transitions_clipped_to_window(self):
+        result = summarize_availability(
+            False, [(True, at(-1)), (False, at(9)), (True, at(12))], START, END)
+        self.assertEqual(result['uptime_seconds'], 9 * 3600)
+        self.assertEqual(result['downtime_seconds'], 3600)
+        self.assertEqual(result['outage_count'], 1)
+
+    def test_end_before_start(self):
+        result = summarize_availability(True, [], START, START - timedelta(hours=1))
+        self.assertIsNone(result['availability'])
+        self.assertEqual(result['observed_seconds'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
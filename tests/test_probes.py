@@ -0,0 +1,151 @@
+"""Loopback tests for the TCP, HTTP and DNS probes.
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from probes import AsyncProber, dns_query_rtt, http_head_rtt, tcp_connect_rtt  # noqa: E402
+
+HOST = '127.0.0.1'
+TIMEOUT = 0.5
+
+def _closed_port():
+    # Bind and release a port so nothing is listening on it
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+class _DnsServer(asyncio.DatagramProtocol):
+    """Answers every query with a bare header, echoing the ID (or a wrong one)"""
+
+    def __init__(self, id_offset=0):
+        self.id_offset = id_offset
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id = (struct.unpack('>H', data[:2])[0] + self.id_offset) % 0x10000
+        self.transport.sendto(struct.pack('>HHHHHH', query_id, 0x8180, 1, 0, 0, 0) + data[12:], addr)
+
+class LoopbackProbeTests(unittest.IsolatedAsyncioTestCase):
+    async def serve_tcp(self, reply=None, tls=None):
+        """Start a TCP server that sends reply (if any) after the request line"""
+        async def handle(reader, writer):
+            if reply is not None:
+                await reader.readline()
+                writer.write(reply)
+                await writer.drain()
+            await reader.read()
+            writer.close()
+
+        server = await asyncio.start_server(handle, HOST, 0, ssl=tls)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        return server.sockets[0].getsockname()[1]
+
+    async def serve_dns(self, id_offset=0):
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DnsServer(id_offset), local_addr=(HOST, 0))
+        self.addCleanup(transport.close)
+        return transport.get_extra_info('sockname')[1]
+
+    async def test_tcp_accepted(self):
+        port = await self.serve_tcp()
+        rtt = await tcp_connect_rtt(HOST, port, TIMEOUT)
+        self.assertIsNotNone(rtt)
+        self.assertGreater(rtt, 0)
+        self.assertLess(rtt, TIMEOUT)
+
+    async def test_tcp_refused(self):
+        self.assertIsNone(await tcp_connect_rtt(HOST, _closed_port(), TIMEOUT))
+
+    async def test_http_head(self):
+        port = await self.serve_tcp(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+        rtt = await http_head_rtt(HOST, port, '/health', TIMEOUT)
+        self.assertIsNotNone(rtt)
+        self.assertLess(rtt, TIMEOUT)
+
+    async def test_http_url_target(self):
+        port = await self.serve_tcp(b'HTTP/1.0 200 OK\r\n\r\n')
+        self.assertIsNotNone(await http_head_rtt('192.0.2.1', 80, f'http://{HOST}:{port}/status', TIMEOUT))
+
+    @unittest.skipUnless(shutil.which('openssl'), "needs openssl to make a certificate")
+    async def test_https_self_signed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+            subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                            '-subj', '/CN=switch.invalid', '-keyout', key, '-out', cert],
+                           check=True, capture_output=True)
+            tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            tls.load_cert_chain(cert, key)
+        port = await self.serve_tcp(b'HTTP/1.1 200 OK\r\n\r\n', tls=tls)
+        self.assertIsNotNone(await http_head_rtt('192.0.2.1', 443, f'https://{HOST}:{port}/', TIMEOUT * 4))
+
+    async def test_http_non_http_reply(self):
+        port = await self.serve_tcp(b'SSH-2.0-OpenSSH_9.6\r\n')
+        self.assertIsNone(await http_head_rtt(HOST, port, None, TIMEOUT))
+
+    async def test_http_refused(self):
+        self.assertIsNone(await http_head_rtt(HOST, _closed_port(), None, TIMEOUT))
+
+    async def test_http_timeout(self):
+        # Accepts the connection but never answers
+        port = await self.serve_tcp()
+        start = time.perf_counter()
+        self.assertIsNone(await http_head_rtt(HOST, port, None, TIMEOUT))
+        self.assertLess(time.perf_counter() - start, TIMEOUT + 0.5)
+
+    async def test_dns_matching_id(self):
+        port = await self.serve_dns()
+        rtt = await dns_query_rtt(HOST, port, 'example.com', TIMEOUT)
+        self.assertIsNotNone(rtt)
+        self.assertLess(rtt, TIMEOUT)
+
+    async def test_dns_mismatched_id(self):
+        # A reply to some other query is ignored, so the probe times out
+        port = await self.serve_dns(id_offset=1)
+        start = time.perf_counter()
+        self.assertIsNone(await dns_query_rtt(HOST, port, 'example.com', TIMEOUT))
+        self.assertGreaterEqual(time.perf_counter() - start, TIMEOUT * 0.9)
+
+    async def test_dns_timeout(self):
+        # A server that reads queries and never answers
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            asyncio.DatagramProtocol, local_addr=(HOST, 0))
+        self.addCleanup(transport.close)
+        start = time.perf_counter()
+        self.assertIsNone(await dns_query_rtt(HOST, transport.get_extra_info('sockname')[1],
+                                              'example.com', TIMEOUT))
+        self.assertLess(time.perf_counter() - start, TIMEOUT + 0.5)
+
+    async def test_dns_port_unreachable(self):
+        self.assertIsNone(await dns_query_rtt(HOST, _closed_port(), 'example.com', TIMEOUT))
+
+    async def test_prober_dispatch(self):
+        tcp_port = await self.serve_tcp()
+        dns_port = await self.serve_dns()
+        prober = AsyncProber(concurrency=4)
+        self.addCleanup(prober.close)
+        self.assertIsNotNone(await prober.probe(
+            {'ip_address': HOST, 'probe_type': 'tcp', 'probe_port': tcp_port}, TIMEOUT))
+        self.assertIsNotNone(await prober.probe(
+            {'ip_address': HOST, 'probe_type': 'dns', 'probe_port': dns_port}, TIMEOUT))
+        with self.assertRaises(ValueError):
+            await prober.probe({'ip_address': HOST, 'probe_type': 'snmp'}, TIMEOUT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Append/read alignment tests for the columnar segment store.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from segment_store import COLUMNS, SegmentStore  # noqa: E402
+
+START = datetime(2026, 1, 31, 23, 0, tzinfo=pytz.UTC)
+
+class SegmentStoreTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.store = SegmentStore(self.root)
+
+    def append(self, store, i, device_id=1):
+        # Each sample's values are derived from i, so misaligned columns show up
+        store.append(device_id, START + timedelta(minutes=i), float(i), i % 2 == 0,
+                     i + 0.1, i + 0.2, i + 0.3, i + 0.4, float(i % 100),
+                     ['jitter'] if i % 3 == 0 else [])
+
+    def assertAligned(self, history):
+        for record in history:
+            i = round((record['timestamp'] - START).total_seconds() / 60)
+            self.assertEqual(record['response_time'], i)
+            self.assertAlmostEqual(record['avg_rtt'], i + 0.3, places=3)
+            self.assertEqual(record['status'], i % 2 == 0)
+            self.assertEqual(record['threshold_violations'], ['jitter'] if i % 3 == 0 else [])
+
+    def test_append_and_read_across_partitions(self):
+        for i in range(120):
+            self.append(self.store, i)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, '1'))), ['2026-01', '2026-02'])
+        history = self.store.get_history(1, limit=None)
+        self.assertEqual(len(history), 120)
+        self.assertEqual(history[0]['timestamp'], START + timedelta(minutes=119))
+        self.assertAligned(history)
+
+    def test_window_and_limit(self):
+        for i in range(120):
+            self.append(self.store, i)
+        history = self.store.get_history(1, limit=None, start=START + timedelta(minutes=30),
+                                         end=START + timedelta(minutes=90))
+        self.assertEqual([r['timestamp'] for r in history],
+                         [START + timedelta(minutes=i) for i in range(89, 29, -1)])
+        self.assertEqual(len(self.store.get_history(1, limit=10)), 10)
+        self.assertEqual(self.store.last_timestamp(1), START + timedelta(minutes=119))
+
+    def test_append_many_matches_append(self):
+        count = 50
+        self.store.append_many(2, {
+            'ts': [START + timedelta(minutes=i) for i in range(count)],
+            'response_time': [float(i) for i in range(count)],
+            'min_rtt': [i + 0.1 for i in range(count)], 'max_rtt': [i + 0.2 for i in range(count)],
+            'avg_rtt': [i + 0.3 for i in range(count)], 'jitter': [i + 0.4 for i in range(count)],
+            'packet_loss': [float(i % 100) for i in range(count)],
+            'status': [1 if i % 2 == 0 else 0 for i in range(count)],
+            'flags': [4 if i % 3 == 0 else 0 for i in range(count)],
+        })
+        self.assertAligned(self.store.get_history(2, limit=None))
+
+    def test_torn_append_is_realigned(self):
+        for i in range(5):
+            self.append(self.store, i)
+        # A crash part way through an append: some columns got the next
+        # sample (one only partly), the rest did not
+        partition = os.path.join(self.root, '1', '2026-01')
+        with open(os.path.join(partition, 'ts.bin'), 'ab') as f:
+            f.write(np.asarray([5 * 60_000], dtype='<u4').tobytes())
+        with open(os.path.join(partition, 'response_time.bin'), 'ab') as f:
+            f.write(b'\x00\x00')
+        self.assertEqual(len(self.store.get_history(1, limit=None)), 5)
+
+        # A restarted writer truncates the partition back before appending
+        restarted = SegmentStore(self.root)
+        for i in range(5, 10):
+            self.append(restarted, i)
+        history = restarted.get_history(1, limit=None)
+        self.assertEqual(len(history), 10)
+        self.assertAligned(history)
+        sizes = {name: os.path.getsize(os.path.join(partition, f'{name}.bin')) // dtype.itemsize
+                 for name, dtype in COLUMNS}
+        self.assertEqual(set(sizes.values()), {10})
+
+    def test_drop_device(self):
+        self.append(self.store, 0)
+        self.store.drop_device(1)
+        self.assertEqual(self.store.get_history(1), [])
+        self.assertIsNone(self.store.last_timestamp(1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Accuracy and serialization tests for QuantileSketch.
+
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sketches import QuantileSketch  # noqa: E402
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+class QuantileSketchTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        # RTT-like: mostly a few ms, with a long tail and some zeros
+        self.values = ([rng.lognormvariate(-5, 1) for _ in range(5000)]
+                       + [rng.uniform(0.5, 2) for _ in range(100)] + [0.0] * 20)
+
+    def assertWithinBound(self, sketch, values):
+        for q in (0.0, 0.5, 0.9, 0.95, 0.99, 1.0):
+            expected = _exact(values, q)
+            self.assertLessEqual(abs(sketch.quantile(q) - expected),
+                                 sketch.relative_accuracy * expected + 1e-12, f"q={q}")
+
+    def test_relative_error(self):
+        sketch = QuantileSketch()
+        for value in self.values:
+            sketch.add(value)
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertWithinBound(sketch, self.values)
+
+    def test_merge_matches_single_sketch(self):
+        parts = [QuantileSketch() for _ in range(4)]
+        for i, value in enumerate(self.values):
+            parts[i % 4].add(value)
+        merged = QuantileSketch()
+        for part in parts:
+            merged.merge(part)
+        self.assertWithinBound(merged, self.values)
+
+    def test_bytes_round_trip(self):
+        sketch = QuantileSketch()
+        for value in self.values:
+            sketch.add(value)
+        restored = QuantileSketch.from_bytes(sketch.to_bytes())
+        self.assertEqual(restored.bins, sketch.bins)
+        self.assertEqual((restored.count, restored.zero_count, restored.min, restored.max),
+                         (sketch.count, sketch.zero_count, sketch.min, sketch.max))
+        self.assertEqual(QuantileSketch().merge_bytes(sketch.to_bytes()).quantile(0.99),
+                         sketch.quantile(0.99))
+
+    def test_empty(self):
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+        self.assertIsNone(QuantileSketch.from_bytes(QuantileSketch().to_bytes()).quantile(0.5))
+
+    def test_rejects_mismatched_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge_bytes(QuantileSketch(0.02).to_bytes())
+        sketch = QuantileSketch()
+        sketch.add(0.01)
+        with self.assertRaises(ValueError):
+            sketch.quantile(1.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,9 +13,52 @@ def format_response_time(response_time):
         return "Timeout"
     return f"{response_time*1000:.1f} ms"
 
+def format_duration(seconds):
+    if seconds is None:
+        return "N/A"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds/60:.1f}m"
+    return f"{seconds/3600:.1f}h"
+
 def calculate_uptime(history):
     if not history:
         return 0
     total = len(history)
     up = sum(1 for record in history if record['status'])
     return (up / total) * 100
+
+def summarize_availability(initial_status, transitions, start, end):
+    """Summarise up/down time inside [start, end] from state transitions.
+
+    initial_status is the state at start (None if unknown) and transitions
+    is a time-ordered list of (status, timestamp) changes inside the window.
+    A None status marks time the monitor wasn't running; like the time
+    before the first known state, it is not counted.
+    """
+    end = max(start, end)
+    uptime = downtime = 0.0
+    outages = []  # (duration in seconds, recovered inside the window)
+    status, since = initial_status, start
+    for new_status, timestamp in list(transitions) + [(None, end)]:
+        timestamp = min(max(timestamp, start), end)
+        duration = (timestamp - since).total_seconds()
+        if status is True:
+            uptime += duration
+        elif status is False and duration > 0:
+            downtime += duration
+            outages.append((duration, new_status is True))
+        status, since = new_status, timestamp
+
+    observed = uptime + downtime
+    recovered = [duration for duration, done in outages if done]
+    return {
+        'availability': (uptime / observed) * 100 if observed else None,
+        'uptime_seconds': uptime,
+        'downtime_seconds': downtime,
+        'observed_seconds': observed,
+        'outage_count': len(outages),
+        'mttr_seconds': sum(recovered) / len(recovered) if recovered else None,
+        'longest_outage_seconds': max((duration for duration, _ in outages), default=0.0),
+    }